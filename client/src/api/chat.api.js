@@ -1,4 +1,4 @@
-import { api, safe } from "./client";
+import { api, safe, API_BASE } from "./client";
 
 /**
  * Ask a question about a processed document.
@@ -14,3 +14,62 @@ export async function askDocumentQuestion(docId, question) {
   );
   return res?.data || null;
 }
+
+/**
+ * Streamed variant: calls `onToken(token)` as the answer is generated.
+ *
+ * Contract:
+ * - Resolves to `{ answer, timings }` once the stream is done
+ * - Resolves to `null` if the stream could not be opened
+ *   (callers fall back to askDocumentQuestion)
+ */
+export async function streamDocumentQuestion(docId, question, onToken) {
+  let res;
+  try {
+    res = await fetch(`${API_BASE}/api/chat/${docId}`, {
+      method: "POST",
+      headers: { "Content-Type": "application/json" },
+      body: JSON.stringify({ question, stream: true }),
+    });
+  } catch (err) {
+    console.error("API Error:", err);
+    return null;
+  }
+  if (!res.ok || !res.body) return null;
+
+  // Short-circuit answers (e.g. nothing retrieved) come back as plain JSON
+  if (!res.headers.get("content-type")?.includes("text/event-stream")) {
+    return res.json();
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let result = null;
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // SSE events are separated by a blank line
+    let end;
+    while ((end = buffer.indexOf("\n\n")) !== -1) {
+      const block = buffer.slice(0, end);
+      buffer = buffer.slice(end + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of block.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+      if (!data) continue;
+
+      const payload = JSON.parse(data);
+      if (event === "done") result = payload;
+      else if (event === "message" && payload.token) onToken(payload.token);
+    }
+  }
+  return result;
+}
@@ -1,20 +1,22 @@
 // src/api/ocr.api.js
-import { api, safe } from "./client";
+import { api, safe, API_BASE } from "./client";
 
 /**
  * Upload a document for OCR processing.
  *
+ * The file is sent as the raw request body so the backend can stream it
+ * to storage without spooling.
+ *
  * Returns:
  * - { id, status, ... } on success
  * - null on failure
  */
 export async function uploadFile(file) {
-  const form = new FormData();
-  form.append("file", file);
-
   const res = await safe(() =>
-    api.post("/api/upload", form, {
-      headers: { "Content-Type": "multipart/form-data" },
+    api.put("/api/upload/stream", file, {
+      params: { filename: file.name },
+      headers: { "Content-Type": file.type || "application/octet-stream" },
+      timeout: 0,
     })
   );
 
@@ -45,6 +47,29 @@ export async function getStatus(jobId) {
   return res?.data || null;
 }
 
+/**
+ * Fetch the status of several jobs in one request.
+ *
+ * Returns:
+ * - { [jobId]: status | null } on success
+ * - null on failure
+ */
+export async function getStatuses(jobIds) {
+  const res = await safe(() =>
+    api.get("/api/status", { params: { ids: jobIds.join(",") } })
+  );
+  return res?.data?.jobs || null;
+}
+
+/**
+ * Server-Sent Events URL streaming status updates for the given jobs.
+ * The stream ends once every job reaches a terminal status.
+ */
+export function statusStreamUrl(jobIds) {
+  const ids = encodeURIComponent(jobIds.join(","));
+  return `${API_BASE}/api/status/stream?ids=${ids}`;
+}
+
 /**
  * Fetch OCR result payload for a completed job.
  *
@@ -15,3 +15,28 @@ export async function searchDocs(query) {
 
   return res?.data?.results ?? null;
 }
+
+/**
+ * List documents, newest first, one page at a time.
+ *
+ * Pass the previous page's nextCursor as `cursor` to continue.
+ * Other params: status, tags (array), tenant, from, to, fields (array).
+ *
+ * Returns:
+ * - { documents, nextCursor } on success
+ * - null on failure
+ */
+export async function listDocuments({ tags, fields, ...params } = {}) {
+  const res = await safe(() =>
+    api.get("/api/documents", {
+      params: {
+        ...params,
+        tags: tags?.length ? tags.join(",") : undefined,
+        fields: fields?.length ? fields.join(",") : undefined,
+      },
+    })
+  );
+  if (!res?.data) return null;
+
+  return { documents: res.data.documents, nextCursor: res.data.next_cursor };
+}
@@ -1,5 +1,5 @@
 import { useState } from "react";
-import { askDocumentQuestion } from "../api/chat.api";
+import { askDocumentQuestion, streamDocumentQuestion } from "../api/chat.api";
 
 export function useChat() {
   const [selectedDoc, setSelectedDoc] = useState(null);
@@ -35,16 +35,24 @@ export function useChat() {
     setChatInput("");
     setChatLoading(true);
 
-    const res = await askDocumentQuestion(selectedDoc.id, question);
+    // Tokens are appended to a placeholder assistant message as they arrive
+    setChatMessages((prev) => [...prev, { role: "assistant", content: "" }]);
+    const setAnswer = (update) =>
+      setChatMessages((prev) => {
+        const last = prev[prev.length - 1];
+        return [...prev.slice(0, -1), { ...last, content: update(last.content) }];
+      });
 
-    setChatMessages((prev) => [
-      ...prev,
-      {
-        role: "assistant",
-        content: res?.answer || "Error contacting backend.",
-      },
-    ]);
+    let res = await streamDocumentQuestion(selectedDoc.id, question, (token) => {
+      setChatLoading(false);
+      setAnswer((content) => content + token);
+    });
+
+    if (!res) {
+      res = await askDocumentQuestion(selectedDoc.id, question);
+    }
 
+    setAnswer(() => res?.answer || "Error contacting backend.");
     setChatLoading(false);
   }
 
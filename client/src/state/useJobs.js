@@ -1,54 +1,60 @@
-import { useEffect, useRef, useState } from "react";
-import { getStatus } from "../api/ocr.api";
+import { useEffect, useState } from "react";
+import { getStatuses, statusStreamUrl } from "../api/ocr.api";
 import { TERMINAL_JOB_STATUSES } from "../constants/jobStatus";
 
 export function useJobs(pollInterval = 2000) {
   const [jobs, setJobs] = useState([]);
-  const pollRef = useRef(null);
+
+  // Stable key of active job ids: (re)subscribe only when the set changes
+  const activeKey = jobs
+    .filter((job) => !TERMINAL_JOB_STATUSES.includes(job.status))
+    .map((job) => job.id)
+    .join(",");
 
   useEffect(() => {
-    // Check if any job is still active
-    const hasActiveJobs = jobs.some(
-      (job) => !TERMINAL_JOB_STATUSES.includes(job.status)
-    );
-
-    // Start polling only if needed
-    if (hasActiveJobs && !pollRef.current) {
-      pollRef.current = setInterval(async () => {
-        setJobs((prevJobs) =>
-          Promise.all(
-            prevJobs.map(async (job) => {
-              if (TERMINAL_JOB_STATUSES.includes(job.status)) {
-                return job;
-              }
-
-              const status = await getStatus(job.id);
-
-              // Only update if status actually changed
-              if (!status || status.status === job.status) {
-                return job;
-              }
-
-              return { ...job, ...status };
-            })
-          )
-        );
+    if (!activeKey) return;
+    const ids = activeKey.split(",");
+
+    function merge(update) {
+      if (!update?.id) return;
+      setJobs((prevJobs) =>
+        prevJobs.map((job) =>
+          job.id === update.id ? { ...job, ...update } : job
+        )
+      );
+    }
+
+    // Fallback: one batched status request per interval
+    let pollTimer = null;
+    function startPolling() {
+      if (pollTimer) return;
+      pollTimer = setInterval(async () => {
+        const statuses = await getStatuses(ids);
+        Object.values(statuses || {}).forEach(merge);
       }, pollInterval);
     }
 
-    // Stop polling when no active jobs
-    if (!hasActiveJobs && pollRef.current) {
-      clearInterval(pollRef.current);
-      pollRef.current = null;
+    // Preferred: server push over Server-Sent Events. The server ends
+    // each stream after a short while and EventSource reconnects on its
+    // own; it only gives up (CLOSED) when streaming is unavailable.
+    let source = null;
+    if (typeof EventSource !== "undefined") {
+      source = new EventSource(statusStreamUrl(ids));
+      source.onmessage = (event) => merge(JSON.parse(event.data));
+      source.addEventListener("end", () => source.close());
+      source.onerror = () => {
+        if (source.readyState !== EventSource.CLOSED) return;
+        startPolling();
+      };
+    } else {
+      startPolling();
     }
 
     return () => {
-      if (pollRef.current) {
-        clearInterval(pollRef.current);
-        pollRef.current = null;
-      }
+      source?.close();
+      if (pollTimer) clearInterval(pollTimer);
     };
-  }, [jobs, pollInterval]);
+  }, [activeKey, pollInterval]);
 
   function addJob(job) {
     setJobs((prev) => [job, ...prev]);
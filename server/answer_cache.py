@@ -0,0 +1,153 @@
+import array
+import hashlib
+import json
+import os
+
+import numpy as np
+import redis
+
+from embedding_cache import normalize
+from redis_lru import RedisLRU, hit_rate
+
+CACHE_PREFIX = "chat:"
+VERSION_PREFIX = "chat:ver:"
+
+CACHE_ENABLED = os.environ.get("CHAT_CACHE", "1") == "1"
+# Cosine similarity above which a different wording counts as the same
+# question; 0 disables near-duplicate matching.
+SIMILARITY = float(os.environ.get("CHAT_CACHE_SIMILARITY", "0"))
+# Questions per document version compared in near-duplicate mode
+MAX_SIMILAR = int(os.environ.get("CHAT_CACHE_MAX_SIMILAR", "500"))
+
+
+def normalize_question(question: str) -> str:
+    return normalize(question).casefold().rstrip("?!. ")
+
+
+class AnswerCache:
+    """
+    Chat answers keyed by (document, document version, normalized question).
+
+    Each entry is a hash holding the question embedding (packed float32),
+    the retrieved chunk ids / texts and the final answer. The document
+    version is bumped whenever the document is (re)indexed, which orphans
+    the old entries; they then age out through the TTL or the LRU trim.
+    """
+
+    def __init__(self, url: str | None = None, ttl: int | None = None,
+                 max_entries: int | None = None):
+        self.r = redis.Redis.from_url(url or os.environ.get("REDIS_URL"))
+        self.ttl = ttl or int(os.environ.get("CHAT_CACHE_TTL", 7 * 86400))
+        self.max_entries = max_entries or int(os.environ.get("CHAT_CACHE_MAX_ENTRIES", 20000))
+        self.lru = RedisLRU(self.r, CACHE_PREFIX, self.ttl, self.max_entries)
+
+    def version(self, doc_id: str) -> int:
+        return int(self.r.get(VERSION_PREFIX + doc_id) or 0)
+
+    def invalidate(self, doc_id: str) -> int:
+        """Called after (re)indexing; returns the new document version."""
+        return self.r.incr(VERSION_PREFIX + doc_id)
+
+    def _prefix(self, doc_id: str, version: int) -> str:
+        return f"{CACHE_PREFIX}{doc_id}:{version}:"
+
+    def key(self, doc_id: str, version: int, question: str) -> str:
+        digest = hashlib.sha256(normalize_question(question).encode()).hexdigest()
+        return self._prefix(doc_id, version) + digest
+
+    def get(self, doc_id: str, version: int, question: str) -> dict | None:
+        return self._load(self.key(doc_id, version, question), "exact")
+
+    def get_similar(self, doc_id: str, version: int, vector: list[float]) -> dict | None:
+        """Best cached answer to a question whose embedding is close enough."""
+        if SIMILARITY <= 0:
+            return None
+
+        keys = list(self.r.smembers(self._prefix(doc_id, version) + "questions"))
+        if not keys:
+            return None
+        pipe = self.r.pipeline(transaction=False)
+        for k in keys:
+            pipe.hget(k, "vector")
+        found = [(k, v) for k, v in zip(keys, pipe.execute()) if v is not None]
+        if not found:
+            return None
+
+        matrix = np.stack([np.frombuffer(v, dtype=np.float32) for _, v in found])
+        query = np.asarray(vector, dtype=np.float32)
+        scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-9)
+        best = int(np.argmax(scores))
+        if scores[best] < SIMILARITY:
+            return None
+
+        entry = self._load(found[best][0].decode(), "similar")
+        if entry:
+            entry["similarity"] = round(float(scores[best]), 4)
+        return entry
+
+    def miss(self):
+        """Records a lookup that found neither an exact nor a similar entry."""
+        self.r.hincrby(self.lru.stats_key, "misses", 1)
+
+    def _load(self, key: str, match: str) -> dict | None:
+        pipe = self.r.pipeline(transaction=False)
+        pipe.hmget(key, "question", "answer", "chunk_ids", "chunks")
+        pipe.expire(key, self.ttl)
+        (question, answer, chunk_ids, chunks), _ = pipe.execute()
+        if answer is None:
+            return None
+
+        pipe = self.r.pipeline(transaction=False)
+        self.lru.touch(pipe, [key])
+        self.lru.count(pipe, **{f"{match}_hits": 1})
+        pipe.execute()
+
+        return {
+            "question": question.decode(),
+            "answer": answer.decode(),
+            "chunk_ids": json.loads(chunk_ids),
+            "chunks": json.loads(chunks),
+            "match": match,
+        }
+
+    def set(self, doc_id: str, version: int, question: str, vector: list[float],
+            chunk_ids: list[str], chunks: list[str], answer: str):
+        key = self.key(doc_id, version, question)
+        questions = self._prefix(doc_id, version) + "questions"
+
+        pipe = self.r.pipeline(transaction=False)
+        pipe.hset(key, mapping={
+            "question": question,
+            "answer": answer,
+            "chunk_ids": json.dumps(chunk_ids),
+            "chunks": json.dumps(chunks),
+            "vector": array.array("f", vector).tobytes(),
+        })
+        pipe.expire(key, self.ttl)
+        if SIMILARITY > 0 and self.r.scard(questions) < MAX_SIMILAR:
+            pipe.sadd(questions, key)
+            pipe.expire(questions, self.ttl)
+        self.lru.add(pipe, [key])
+
+    def stats(self) -> dict:
+        raw = self.lru.counters()
+        exact, similar = raw.get("exact_hits", 0), raw.get("similar_hits", 0)
+        misses = raw.get("misses", 0)
+        return {
+            "exact_hits": exact,
+            "similar_hits": similar,
+            "misses": misses,
+            "evictions": raw["evictions"],
+            "hit_rate": hit_rate(exact + similar, exact + similar + misses),
+            "entries": raw["entries"],
+        }
+
+
+_cache = None
+
+
+def cache() -> AnswerCache | None:
+    global _cache
+    if _cache is None and CACHE_ENABLED:
+        _cache = AnswerCache()
+    return _cache
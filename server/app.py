@@ -1,29 +1,43 @@
+import base64
 import json
-from sqlalchemy import select, inspect
-from flask import Flask, request, jsonify
+import mimetypes
+import os
+import re
+import zipfile
+import redis
+from sqlalchemy import select, insert, update, delete, inspect, func, text, tuple_
+from sqlalchemy.dialects.postgresql import array
+from sqlalchemy.orm import aliased
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
-import os
+import time
+from datetime import datetime, timezone
 
-from status_store import StatusStore
-from storage import upload_file, generate_signed_url
-from tasks import process_document
+from status_store import StatusStore, TERMINAL_STATUSES
+from storage import (
+    BUCKET as GCS_BUCKET,
+    upload_file,
+    stream_upload,
+    create_upload_session,
+    object_exists,
+    generate_signed_url,
+    signed_url_cache,
+    HashingReader,
+)
+from tasks import publish_jobs, LIMITER, LANES
+from tenant_limits import DEFAULT_TENANT
+from ttl_cache import TTLCache
+import vector_store
 from db import Base, engine, get_session
-from models import Document
+from models import Document, SchemaVersion, SCHEMA_UPGRADES
+from embeddings import embed, cache as embedding_cache
+from answer_cache import cache as answer_cache
 
-# OpenAI for embeddings + chat
+# OpenAI for chat
 from openai import OpenAI
 client = OpenAI()
 
-# Qdrant client
-from qdrant_client import QdrantClient
-from qdrant_client.models import Filter, FieldCondition, MatchValue
-
-QDRANT_URL = os.environ.get("QDRANT_URL", "http://qdrant:6333")
-QDRANT_COLLECTION = os.environ.get("QDRANT_COLLECTION", "ocr_documents")
-
-qclient = QdrantClient(url=QDRANT_URL)
-
 app = Flask(__name__)
 CORS(app, origins="*")
 
@@ -33,16 +47,44 @@ STATUS = StatusStore()
 # --------------------------
 # DB Init
 # --------------------------
+# Arbitrary key for the advisory lock serialising schema setup
+SCHEMA_LOCK_ID = 5_061_732_014
+
+
+def schema_version(conn) -> int | None:
+    """Applied SCHEMA_UPGRADES count; None before the tables exist."""
+    tables = inspect(conn).get_table_names()
+    if "documents" not in tables:
+        return None
+    if "schema_version" not in tables:
+        # Created before versioning: replay every (idempotent) upgrade
+        return 0
+    return conn.execute(select(func.max(SchemaVersion.version))).scalar() or 0
+
+
 def init_db():
-    """Initialize database tables. Safe for concurrent calls."""
-    try:
-        inspector = inspect(engine)
-        if 'documents' not in inspector.get_table_names():
-            Base.metadata.create_all(bind=engine)
-    except Exception as e:
-        msg = str(e).lower()
-        if "already exists" not in msg and "duplicate" not in msg:
-            raise
+    """
+    Initialize database tables and apply pending SCHEMA_UPGRADES.
+
+    Every gunicorn worker runs this at import. An up-to-date schema is
+    detected with plain reads, so restarts take no locks on documents.
+    Otherwise the setup runs in one transaction under an advisory lock
+    and the workers take turns (the later ones find nothing left to do).
+    """
+    with engine.connect() as conn:
+        if schema_version(conn) == len(SCHEMA_UPGRADES):
+            return
+
+    with engine.begin() as conn:
+        conn.execute(select(func.pg_advisory_xact_lock(SCHEMA_LOCK_ID)))
+        version = schema_version(conn)
+        # New databases get the current models, so no upgrades apply
+        pending = [] if version is None else SCHEMA_UPGRADES[version:]
+        Base.metadata.create_all(bind=conn)
+        for ddl in pending:
+            conn.execute(text(ddl))
+        conn.execute(delete(SchemaVersion))
+        conn.execute(insert(SchemaVersion).values(version=len(SCHEMA_UPGRADES)))
 
 
 with app.app_context():
@@ -54,9 +96,131 @@ def health():
     return {"ok": True}
 
 
+@app.get("/api/metrics")
+def metrics():
+    embeddings, answers = embedding_cache(), answer_cache()
+    return jsonify({
+        "embedding_cache": embeddings.stats() if embeddings else None,
+        "answer_cache": answers.stats() if answers else None,
+        "signed_url_cache": signed_url_cache.stats(),
+        "result_cache": result_cache.stats()
+    })
+
+
 # --------------------------
 # UPLOAD  ✅ FIXED RESPONSE
 # --------------------------
+def request_tenant() -> str:
+    tenant = re.sub(r"[^A-Za-z0-9_.-]", "", request.headers.get("X-Tenant-Id", ""))[:64]
+    return tenant or DEFAULT_TENANT
+
+
+def create_jobs(files: list[tuple[str, str]], tenant: str = DEFAULT_TENANT) -> list[str]:
+    """
+    Creates status hashes and Document rows for new uploads of
+    (filename, mime); all rows are inserted in one transaction.
+    """
+    job_ids = STATUS.new_jobs([filename for filename, _ in files], tenant)
+
+    # Create DB records
+    with get_session() as s:
+        s.add_all([
+            Document(
+                id=job_id,
+                filename=filename,
+                mime=mime or "",
+                gcs_uri="",
+                status="UPLOADING",
+                tenant=tenant,
+                text="",
+                entities=[],
+                tags=[]
+            )
+            for job_id, (filename, mime) in zip(job_ids, files)
+        ])
+        s.commit()
+
+    STATUS.update_many({
+        job_id: {"status": "UPLOADING", "progress": 20, "stage": "Uploading to GCS"}
+        for job_id in job_ids
+    })
+    return job_ids
+
+
+def create_job(filename: str, mime: str, tenant: str = DEFAULT_TENANT) -> str:
+    return create_jobs([(filename, mime)], tenant)[0]
+
+
+def queue_jobs(jobs: list[dict], lane: str = "interactive", tenant: str = DEFAULT_TENANT) -> list[dict]:
+    """
+    Records the stored objects and queues processing for jobs of
+    {job_id, filename, gcs_uri, content_hash}, in one transaction and one
+    broker connection. Jobs whose bytes were already processed complete
+    immediately instead.
+    """
+    with get_session() as s:
+        s.execute(update(Document), [
+            {"id": j["job_id"], "gcs_uri": j["gcs_uri"],
+             "content_hash": j["content_hash"], "status": "QUEUED"}
+            for j in jobs
+        ])
+        s.commit()
+
+        hashes = {j["content_hash"] for j in jobs if j["content_hash"]}
+        processed = set(s.execute(
+            select(Document.content_hash).where(
+                Document.content_hash.in_(hashes), Document.status == "COMPLETED"
+            )
+        ).scalars()) if hashes else set()
+
+    results = []
+    queued = []
+    for j in jobs:
+        # Same bytes already processed: reuse the results, skip the worker
+        source_id = (
+            reuse_processed_duplicate(j["job_id"], j["content_hash"])
+            if j["content_hash"] in processed else None
+        )
+        if source_id:
+            STATUS.update(
+                j["job_id"], status="COMPLETED", progress=100,
+                stage="Reused results of identical upload",
+                gcs_uri=j["gcs_uri"], duplicate_of=source_id
+            )
+            results.append({
+                "job_id": j["job_id"],
+                "document_id": j["job_id"],
+                "status": "COMPLETED",
+                "duplicate_of": source_id
+            })
+        else:
+            queued.append(j)
+            results.append({"job_id": j["job_id"], "document_id": j["job_id"], "status": "QUEUED"})
+
+    STATUS.update_many({
+        j["job_id"]: {"status": "QUEUED", "progress": 40, "stage": "Waiting for a worker slot",
+                      "gcs_uri": j["gcs_uri"], "lane": lane}
+        for j in queued
+    })
+
+    # Only jobs with a free tenant slot reach the broker now; the rest are
+    # published by workers as running jobs finish
+    publish_jobs(LIMITER.submit(tenant, lane, [
+        {"job_id": j["job_id"], "gcs_uri": j["gcs_uri"], "filename": j["filename"],
+         "lane": lane, "tenant": tenant}
+        for j in queued
+    ]))
+    return results
+
+
+def queue_job(job_id: str, filename: str, gcs_uri: str, content_hash: str | None,
+              tenant: str = DEFAULT_TENANT):
+    """Single-upload variant of queue_jobs, on the interactive lane."""
+    job = {"job_id": job_id, "filename": filename, "gcs_uri": gcs_uri, "content_hash": content_hash}
+    # ✅ CRITICAL FIX: frontend-safe response
+    return jsonify(queue_jobs([job], "interactive", tenant)[0]), 200
+
+
 @app.post("/api/upload")
 def upload():
     if "file" not in request.files:
@@ -67,51 +231,295 @@ def upload():
         return jsonify({"error": "Empty filename"}), 400
 
     filename = secure_filename(f.filename)
-    job_id = STATUS.new_job(filename)
+    tenant = request_tenant()
+    job_id = create_job(filename, f.mimetype, tenant)
 
-    # Create DB record
-    with get_session() as s:
-        doc = Document(
-            id=job_id,
-            filename=filename,
-            mime=f.mimetype or "",
-            gcs_uri="",
-            status="UPLOADING",
-            text="",
-            entities_json="[]",
-            tags_json="[]"
-        )
-        s.add(doc)
-        s.commit()
+    # Upload file, hashing the bytes on the way through
+    dest = f"uploads/{job_id}/{filename}"
+    reader = HashingReader(f.stream)
+    gcs_uri = upload_file(reader, dest, content_type=f.mimetype)
+
+    return queue_job(job_id, filename, gcs_uri, reader.hexdigest(), tenant)
+
+
+@app.route("/api/upload/stream", methods=["PUT", "POST"])
+def upload_stream():
+    """
+    Raw-body upload: PUT /api/upload/stream?filename=scan.pdf with the file
+    bytes as the request body. Nothing is spooled; the body is piped to a
+    resumable GCS upload in fixed-size chunks while it is hashed.
+    """
+    filename = secure_filename(request.args.get("filename", ""))
+    if not filename:
+        return jsonify({"error": "Empty filename"}), 400
+
+    mime = request.mimetype or "application/octet-stream"
+    tenant = request_tenant()
+    job_id = create_job(filename, mime, tenant)
+
+    dest = f"uploads/{job_id}/{filename}"
+    gcs_uri, content_hash, _ = stream_upload(request.stream, dest, content_type=mime)
+
+    return queue_job(job_id, filename, gcs_uri, content_hash, tenant)
+
+
+@app.post("/api/upload/session")
+def upload_session():
+    """
+    Direct-to-storage upload. Returns a resumable GCS session URL the
+    client uploads to itself (the API never touches the bytes), then the
+    client calls /api/upload/<job_id>/complete.
+    Body: {"filename": ..., "content_type": ..., "size": ...}
+    """
+    data = request.json or {}
+    filename = secure_filename(data.get("filename", ""))
+    if not filename:
+        return jsonify({"error": "Empty filename"}), 400
 
-    STATUS.update(job_id, status="UPLOADING", progress=20, stage="Uploading to GCS")
+    mime = data.get("content_type") or "application/octet-stream"
+    job_id = create_job(filename, mime, request_tenant())
 
-    # Upload file
     dest = f"uploads/{job_id}/{filename}"
-    gcs_uri = upload_file(f, dest, content_type=f.mimetype)
+    upload_url, gcs_uri = create_upload_session(
+        dest, content_type=mime, size=data.get("size"), origin=request.headers.get("Origin")
+    )
+    STATUS.update(job_id, stage="Waiting for direct upload", gcs_uri=gcs_uri)
+
+    return jsonify({"job_id": job_id, "upload_url": upload_url, "gcs_uri": gcs_uri}), 200
+
 
+@app.post("/api/upload/<job_id>/complete")
+def upload_complete(job_id):
     with get_session() as s:
         d = s.get(Document, job_id)
-        d.gcs_uri = gcs_uri
-        d.status = "QUEUED"
-        s.commit()
+        if not d or d.status != "UPLOADING":
+            return jsonify({"error": "not found"}), 404
+        filename, tenant = d.filename, d.tenant
 
-    STATUS.update(job_id, status="QUEUED", progress=40, stage="Queued", gcs_uri=gcs_uri)
+    gcs_uri = f"gs://{GCS_BUCKET}/uploads/{job_id}/{filename}"
+    if not object_exists(gcs_uri):
+        return jsonify({"error": "upload not finished"}), 409
 
-    # Queue worker
-    process_document.delay(job_id, gcs_uri, filename)
+    # The worker hashes the file after download, for future dedup
+    return queue_job(job_id, filename, gcs_uri, None, tenant)
+
+
+BATCH_MAX_FILES = int(os.environ.get("BATCH_MAX_FILES", "1000"))
+
+
+def batch_files(files) -> list[dict]:
+    """Multipart files of a batch; .zip archives are expanded to their members."""
+    items = []
+    for f in files:
+        if not f.filename:
+            continue
+        if f.filename.lower().endswith(".zip"):
+            archive = zipfile.ZipFile(f.stream)
+            for info in archive.infolist():
+                filename = secure_filename(os.path.basename(info.filename))
+                if info.is_dir() or not filename or info.filename.startswith("__MACOSX/"):
+                    continue
+                items.append({
+                    "filename": filename,
+                    "mime": mimetypes.guess_type(filename)[0] or "application/octet-stream",
+                    "open": lambda archive=archive, info=info: archive.open(info),
+                })
+        else:
+            items.append({
+                "filename": secure_filename(f.filename),
+                "mime": f.mimetype,
+                "open": lambda f=f: f.stream,
+            })
+    return items
+
+
+def batch_manifest(entries: list) -> list[dict] | None:
+    """Manifest entries {gcs_uri, filename?} for objects already in the bucket."""
+    items = []
+    for entry in entries:
+        gcs_uri = entry.get("gcs_uri", "")
+        if not gcs_uri.startswith(f"gs://{GCS_BUCKET}/"):
+            return None
+        filename = secure_filename(entry.get("filename") or gcs_uri.rsplit("/", 1)[-1])
+        items.append({
+            "filename": filename,
+            "mime": entry.get("content_type") or mimetypes.guess_type(filename)[0] or "",
+            "gcs_uri": gcs_uri,
+        })
+    return items
 
-    # ✅ CRITICAL FIX: frontend-safe response
-    return jsonify({
-        "job_id": job_id,
-        "document_id": job_id,
-        "status": "QUEUED"
-    }), 200
+
+@app.post("/api/upload/batch")
+def upload_batch():
+    """
+    Creates many jobs in one request, on the "bulk" lane by default
+    (?lane=interactive to override). Either multipart "files" (zip
+    archives are expanded), or a JSON manifest of objects already in the
+    bucket: {"files": [{"gcs_uri": "gs://...", "filename": "..."}]}.
+    The Document rows are created, and later queued, in one transaction
+    each.
+    """
+    lane = request.args.get("lane", "bulk")
+    if lane not in LANES:
+        return jsonify({"error": f"lane must be one of {sorted(LANES)}"}), 400
+    tenant = request_tenant()
+
+    if request.is_json:
+        items = batch_manifest((request.json or {}).get("files", []))
+        if items is None:
+            return jsonify({"error": f"gcs_uri must be in gs://{GCS_BUCKET}/"}), 400
+    else:
+        items = batch_files(request.files.getlist("files") + request.files.getlist("file"))
+
+    if not items:
+        return jsonify({"error": "No files"}), 400
+    if len(items) > BATCH_MAX_FILES:
+        return jsonify({"error": f"At most {BATCH_MAX_FILES} files per batch"}), 413
+
+    job_ids = create_jobs([(i["filename"], i["mime"]) for i in items], tenant)
+
+    jobs = []
+    for job_id, item in zip(job_ids, items):
+        job = {"job_id": job_id, "filename": item["filename"],
+               "gcs_uri": item.get("gcs_uri"), "content_hash": None}
+        if not job["gcs_uri"]:
+            # Upload file, hashing the bytes on the way through
+            with item["open"]() as stream:
+                reader = HashingReader(stream)
+                job["gcs_uri"] = upload_file(
+                    reader, f"uploads/{job_id}/{item['filename']}", content_type=item["mime"]
+                )
+                job["content_hash"] = reader.hexdigest()
+        jobs.append(job)
+
+    return jsonify({"lane": lane, "tenant": tenant, "jobs": queue_jobs(jobs, lane, tenant)}), 200
+
+
+def reuse_processed_duplicate(job_id: str, content_hash: str) -> str | None:
+    """
+    If a COMPLETED document has the same content hash, copy its text,
+    entities, tags and vectors onto job_id. Returns the source id, or
+    None when there is nothing to reuse (or copying failed).
+    """
+    with get_session() as s:
+        src_id = s.execute(
+            select(Document.id)
+            .where(Document.content_hash == content_hash,
+                   Document.status == "COMPLETED",
+                   Document.id != job_id)
+            .order_by(Document.created_at)
+            .limit(1)
+        ).scalar()
+        if not src_id:
+            return None
+
+        try:
+            vector_store.copy_document(src_id, job_id, created_at=int(time.time()))
+        except Exception as e:
+            print(f"Could not reuse vectors of {src_id}: {e}")
+            return None
+
+        # Copied inside Postgres; the text never passes through the API
+        src = aliased(Document)
+        s.execute(
+            update(Document)
+            .where(Document.id == job_id, src.id == src_id)
+            .values(text=src.text, entities=src.entities, tags=src.tags, status="COMPLETED")
+        )
+        s.commit()
+        return src_id
 
 
 # --------------------------
 # STATUS
 # --------------------------
+MAX_STATUS_IDS = 200
+SSE_KEEPALIVE_SECONDS = 15
+# Each open stream holds a request slot (a thread under gthread), so a
+# stream ends after this long and EventSource reconnects with a snapshot
+SSE_MAX_SECONDS = int(os.environ.get("SSE_MAX_SECONDS", "30"))
+# Status streams are only worth their held slots under the cooperative
+# gevent worker; otherwise clients are told to poll /api/status
+SSE_STATUS_STREAM = os.environ.get(
+    "SSE_STATUS_STREAM", "1" if os.environ.get("API_SERVING_MODE", "gevent") == "gevent" else "0"
+) == "1"
+
+
+def sse(data: dict, event: str | None = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def sse_response(events) -> Response:
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def job_ids_arg() -> list[str]:
+    ids = [i for i in request.args.get("ids", "").split(",") if i]
+    return list(dict.fromkeys(ids))[:MAX_STATUS_IDS]
+
+
+@app.get("/api/status")
+def status_batch():
+    """Batch status for clients that still poll: /api/status?ids=a,b,c"""
+    ids = job_ids_arg()
+    if not ids:
+        return jsonify({"error": "ids required"}), 400
+    return jsonify({"jobs": {k: v or None for k, v in STATUS.get_many(ids).items()}})
+
+
+@app.get("/api/status/stream")
+def status_stream():
+    """
+    Server-Sent Events for one or more jobs: /api/status/stream?ids=a,b
+    Sends a snapshot of each job, then every update published by
+    StatusStore. Sends an "end" event once all jobs reach a terminal
+    status; after SSE_MAX_SECONDS it closes without one and the client
+    reconnects. 503 when streams are disabled (clients poll instead).
+    """
+    if not SSE_STATUS_STREAM:
+        return jsonify({"error": "status streaming disabled, poll /api/status"}), 503
+    ids = job_ids_arg()
+    if not ids:
+        return jsonify({"error": "ids required"}), 400
+
+    def events():
+        deadline = time.monotonic() + SSE_MAX_SECONDS
+        # Subscribe before the snapshot so no update falls in between
+        pubsub = STATUS.subscribe(ids)
+        try:
+            active = set()
+            for job_id, data in STATUS.get_many(ids).items():
+                if data:
+                    yield sse(data)
+                    if data.get("status") not in TERMINAL_STATUSES:
+                        active.add(job_id)
+
+            while active:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    # Reconnect soon; the new stream starts with a snapshot
+                    yield "retry: 1000\n\n"
+                    return
+                msg = pubsub.get_message(timeout=min(SSE_KEEPALIVE_SECONDS, remaining))
+                if msg is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                data = json.loads(msg["data"])
+                yield sse(data)
+                if data.get("status") in TERMINAL_STATUSES:
+                    active.discard(data["id"])
+            yield sse({}, event="end")
+        finally:
+            pubsub.close()
+
+    return sse_response(events())
+
+
 @app.get("/api/status/<job_id>")
 def status(job_id):
     data = STATUS.get(job_id)
@@ -120,54 +528,374 @@ def status(job_id):
     return jsonify(data)
 
 
+@app.get("/api/status/<job_id>/pages")
+def status_pages(job_id):
+    pages = STATUS.get_pages(job_id)
+    return jsonify({
+        "pages": [{"page": n, **info} for n, info in sorted(pages.items())]
+    })
+
+
+# --------------------------
+# DOCUMENTS (keyset-paginated listing)
+# --------------------------
+# Columns a listing may project; text is only served by /api/result
+LIST_FIELDS = {
+    "id": Document.id,
+    "filename": Document.filename,
+    "mime": Document.mime,
+    "status": Document.status,
+    "tenant": Document.tenant,
+    "tags": Document.tags,
+    "entities": Document.entities,
+    "content_hash": Document.content_hash,
+    "created_at": Document.created_at,
+    "updated_at": Document.updated_at,
+}
+DEFAULT_LIST_FIELDS = ["id", "filename", "status", "tags", "created_at", "updated_at"]
+
+
+def encode_cursor(created_at: datetime, doc_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), doc_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+    created_at, doc_id = json.loads(raw)
+    return datetime.fromisoformat(created_at), str(doc_id)
+
+
+def json_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+@app.get("/api/documents")
+def list_documents():
+    """
+    Newest-first document listing with keyset pagination.
+
+    Query args: limit, cursor (next_cursor of the previous page), status,
+    tags (comma separated, any match), tenant, from/to (ISO dates on
+    upload time), fields (comma separated, see LIST_FIELDS).
+    """
+    limit = int_arg("limit", 50, 1, 200)
+    fields = [f for f in request.args.get("fields", "").split(",") if f] or DEFAULT_LIST_FIELDS
+    unknown = [f for f in fields if f not in LIST_FIELDS]
+    if unknown:
+        return jsonify({"error": f"unknown fields: {', '.join(unknown)}"}), 400
+    tags = [t for t in request.args.get("tags", "").split(",") if t]
+    try:
+        date_from, date_to = date_arg("from"), date_arg("to")
+    except ValueError:
+        return jsonify({"error": "from/to must be ISO dates"}), 400
+
+    # created_at/id are always read: they make up the cursor
+    stmt = (
+        select(*(LIST_FIELDS[f] for f in fields),
+               Document.created_at.label("cursor_created_at"), Document.id.label("cursor_id"))
+        .order_by(Document.created_at.desc(), Document.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor := request.args.get("cursor"):
+        try:
+            after = decode_cursor(cursor)
+        except (ValueError, TypeError):
+            return jsonify({"error": "invalid cursor"}), 400
+        # Row-value comparison uses idx_doc_created as a range scan
+        stmt = stmt.where(tuple_(Document.created_at, Document.id) < after)
+    if status_filter := request.args.get("status"):
+        stmt = stmt.where(Document.status == status_filter)
+    if tenant := request.args.get("tenant"):
+        stmt = stmt.where(Document.tenant == tenant)
+    if tags:
+        stmt = stmt.where(Document.tags.has_any(array(tags)))
+    if date_from:
+        stmt = stmt.where(Document.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(Document.created_at <= date_to)
+
+    with get_session() as s:
+        rows = s.execute(stmt).all()
+
+    page = rows[:limit]
+    return jsonify({
+        "documents": [{f: json_value(getattr(row, f)) for f in fields} for row in page],
+        "limit": limit,
+        "next_cursor": (
+            encode_cursor(page[-1].cursor_created_at, page[-1].cursor_id) if len(rows) > limit else None
+        ),
+    })
+
+
 # --------------------------
 # RESULT
 # --------------------------
+# Completed results are immutable until reprocessed, so a short TTL is
+# enough to absorb repeated reads without serving stale text for long.
+RESULT_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", 30))
+result_cache = TTLCache(int(os.environ.get("RESULT_CACHE_SIZE", 256)))
+
+
+def load_result(job_id: str) -> dict | None:
+    """Result of a document from Postgres, through the result cache."""
+    cached = result_cache.get(job_id)
+    if cached is not None:
+        return cached
+
+    with get_session() as s:
+        row = s.execute(
+            select(Document.id, Document.filename, Document.status, Document.text,
+                   Document.entities, Document.tags, Document.updated_at)
+            .where(Document.id == job_id)
+        ).first()
+    if not row:
+        return None
+
+    data = row._asdict()
+    data["text"] = data["text"] or ""
+    data["etag"] = f"{job_id}-{int(row.updated_at.timestamp() * 1e6)}"
+    # Only final results are cached; in-progress rows change every stage
+    if row.status == "COMPLETED":
+        result_cache.set(job_id, data, RESULT_CACHE_TTL)
+    return data
+
+
 @app.get("/api/result/<job_id>")
 def result(job_id):
-    data = STATUS.get(job_id)
+    """
+    OCR result of a completed document. JSON by default; ?format=text
+    returns the plain text and supports Range requests (206). Both carry
+    an ETag, so revalidation with If-None-Match gets a 304.
+    """
+    data = load_result(job_id)
     if not data:
         return jsonify({"error": "not found"}), 404
-    if data.get("status") != "COMPLETED":
-        return jsonify({"error": "not ready"}), 409
+    if data["status"] != "COMPLETED":
+        return jsonify({"error": "not ready", "status": data["status"]}), 409
 
-    return jsonify({
-        "text": data.get("text", ""),
-        "entities": data.get("entities", "[]")
+    if request.args.get("format") == "text":
+        body = data["text"].encode()
+        resp = Response(body, mimetype="text/plain")
+        resp.set_etag(data["etag"] + "-text")
+        resp.cache_control.no_cache = True
+        return resp.make_conditional(request, accept_ranges=True, complete_length=len(body))
+
+    resp = jsonify({
+        "id": data["id"],
+        "filename": data["filename"],
+        "text": data["text"],
+        "entities": data["entities"],
+        "tags": data["tags"],
+        "updated_at": data["updated_at"].isoformat(),
     })
+    resp.set_etag(data["etag"])
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
 
 
 # --------------------------
-# SEARCH (Postgres only)
+# SEARCH (Postgres full-text)
 # --------------------------
+def int_arg(name: str, default: int, lo: int, hi: int) -> int:
+    """Read an integer query arg, clamped to [lo, hi]."""
+    try:
+        value = int(request.args.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    return max(lo, min(value, hi))
+
+
+def fulltext_query(q: str, *columns):
+    """Ranked full-text match on the GIN-indexed search_vector."""
+    tsq = func.websearch_to_tsquery("english", q)
+    rank = func.ts_rank_cd(Document.search_vector, tsq).label("rank")
+    return (
+        select(*columns, rank)
+        .where(Document.search_vector.op("@@")(tsq))
+        .order_by(rank.desc(), Document.id)
+    )
+
+
 @app.get("/api/search")
 def search():
-    q = request.args.get("q", "").lower()
+    q = request.args.get("q", "").strip()
     if not q:
         return jsonify({"results": []})
 
+    limit = int_arg("limit", 20, 1, 100)
+    offset = int_arg("offset", 0, 0, 10_000)
+    # preview=0 skips URL signing; clients can fetch /api/download/<id> on demand
+    with_preview = request.args.get("preview", "1") != "0"
+
+    # Uses the GIN index on search_vector; only the response columns are read
+    stmt = fulltext_query(
+        q,
+        Document.id,
+        Document.filename,
+        Document.status,
+        Document.tags,
+        Document.gcs_uri,
+    ).limit(limit).offset(offset)
+
     results = []
     with get_session() as s:
-        docs = s.execute(select(Document)).scalars().all()
-
-        for d in docs:
-            blob = " ".join([
-                d.filename.lower(),
-                (d.text or "").lower(),
-                " ".join(json.loads(d.tags_json or "[]")).lower(),
-                (d.entities_json or "").lower()
-            ])
-
-            if q in blob:
-                results.append({
-                    "id": d.id,
-                    "filename": d.filename,
-                    "status": d.status,
-                    "tags": json.loads(d.tags_json or "[]"),
-                    "previewUrl": generate_signed_url(d.gcs_uri, minutes=20)
-                })
+        for row in s.execute(stmt):
+            results.append({
+                "id": row.id,
+                "filename": row.filename,
+                "status": row.status,
+                "tags": row.tags,
+                "rank": float(row.rank),
+                "previewUrl": (
+                    generate_signed_url(row.gcs_uri, minutes=20)
+                    if with_preview and row.gcs_uri else None
+                )
+            })
+
+    return jsonify({
+        "results": results,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": offset + limit if len(results) == limit else None
+    })
+
+
+# --------------------------
+# SEMANTIC SEARCH (Qdrant + hybrid rank)
+# --------------------------
+RRF_K = 60  # reciprocal rank fusion constant
+# Upper bound on groups fetched from Qdrant when filtering by status
+SEMANTIC_MAX_GROUPS = 1000
+
+
+def date_arg(name: str) -> datetime | None:
+    value = request.args.get(name)
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+@app.get("/api/semantic-search")
+def semantic_search():
+    """
+    Corpus-wide semantic search, grouped by document and fused with the
+    full-text ranking (reciprocal rank fusion).
+
+    Query args: q, tags (comma separated, any match), status, from/to
+    (ISO dates on upload time), limit, offset, chunks (per document).
+    """
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"results": []})
+
+    limit = int_arg("limit", 10, 1, 50)
+    offset = int_arg("offset", 0, 0, 500)
+    per_doc = int_arg("chunks", 3, 1, 10)
+    tags = [t for t in request.args.get("tags", "").split(",") if t]
+    status_filter = request.args.get("status")
+    try:
+        date_from, date_to = date_arg("from"), date_arg("to")
+    except ValueError:
+        return jsonify({"error": "from/to must be ISO dates"}), 400
+
+    window = offset + limit
+
+    # ---- Semantic candidates: top chunks grouped per document ----
+    # Chunk payloads carry no status (it changes after indexing), so with
+    # a status filter fetch more groups until `window` of them match.
+    query_vector = embed(q)
+    query_filter = vector_store.corpus_filter(
+        tags,
+        int(date_from.timestamp()) if date_from else None,
+        int(date_to.timestamp()) if date_to else None,
+    )
+    fetch = window
+    while True:
+        groups = vector_store.search_documents(
+            query_vector, limit=fetch, per_document=per_doc, query_filter=query_filter
+        )
+        if not status_filter:
+            break
+        with get_session() as s:
+            matching = set(s.execute(
+                select(Document.id).where(
+                    Document.id.in_([g.id for g in groups]), Document.status == status_filter
+                )
+            ).scalars())
+        exhausted = len(groups) < fetch or fetch >= SEMANTIC_MAX_GROUPS
+        groups = [g for g in groups if g.id in matching]
+        if len(groups) >= window or exhausted:
+            groups = groups[:window]
+            break
+        fetch = min(fetch * 4, SEMANTIC_MAX_GROUPS)
+
+    semantic_rank = {g.id: i for i, g in enumerate(groups)}
+    chunks = {
+        g.id: [
+            {"text": h.payload.get("text", ""), "chunk_index": h.payload.get("chunk_index"),
+             "page": h.payload.get("page"), "score": h.score}
+            for h in g.hits
+        ]
+        for g in groups
+    }
+
+    # ---- Lexical candidates + metadata for everything we may return ----
+    # Same filters on both, so the lexical window isn't spent on
+    # documents that would be dropped afterwards
+    filters = []
+    if tags:
+        # jsonb ?| — any of the tags; served by idx_doc_tags
+        filters.append(Document.tags.has_any(array(tags)))
+    if status_filter:
+        filters.append(Document.status == status_filter)
+    if date_from:
+        filters.append(Document.created_at >= date_from)
+    if date_to:
+        filters.append(Document.created_at <= date_to)
+
+    with get_session() as s:
+        lexical_ids = s.execute(
+            fulltext_query(q, Document.id).where(*filters).limit(window)
+        ).scalars().all()
+        lexical_rank = {doc_id: i for i, doc_id in enumerate(lexical_ids)}
+
+        meta_stmt = select(
+            Document.id, Document.filename, Document.status, Document.tags, Document.created_at
+        ).where(Document.id.in_(set(semantic_rank) | set(lexical_rank)), *filters)
+        meta = {row.id: row for row in s.execute(meta_stmt)}
+
+    # ---- Hybrid rank ----
+    scored = []
+    for doc_id, row in meta.items():
+        score = sum(
+            1.0 / (RRF_K + ranks[doc_id] + 1)
+            for ranks in (semantic_rank, lexical_rank) if doc_id in ranks
+        )
+        scored.append((score, doc_id, row.tags))
+    scored.sort(key=lambda x: (-x[0], x[1]))
 
-    return jsonify({"results": results})
+    results = [
+        {
+            "id": doc_id,
+            "filename": meta[doc_id].filename,
+            "status": meta[doc_id].status,
+            "tags": doc_tags,
+            "score": round(score, 6),
+            "semantic_rank": semantic_rank.get(doc_id),
+            "lexical_rank": lexical_rank.get(doc_id),
+            "chunks": chunks.get(doc_id, []),
+        }
+        for score, doc_id, doc_tags in scored[offset:window]
+    ]
+
+    return jsonify({
+        "results": results,
+        "limit": limit,
+        "offset": offset,
+        "next_offset": window if len(scored) > window else None
+    })
 
 
 # --------------------------
@@ -185,36 +913,65 @@ def download_url(job_id):
 # --------------------------
 # RAG CHAT
 # --------------------------
-@app.post("/api/chat/<doc_id>")
-def chat(doc_id):
-    data = request.json
-    question = data.get("question", "").strip()
+CHAT_MODEL = os.environ.get("CHAT_MODEL", "gpt-4o-mini")
 
-    if not question:
-        return jsonify({"error": "Empty question"}), 400
 
-    q_emb = client.embeddings.create(
-        model="text-embedding-3-small",
-        input=question
-    ).data[0].embedding
-
-    hits = qclient.search(
-        collection_name=QDRANT_COLLECTION,
-        query_vector=q_emb,
-        limit=5,
-        query_filter=Filter(
-            must=[FieldCondition(key="document_id", match=MatchValue(value=doc_id))]
-        )
-    )
+def ms_since(start: float) -> int:
+    return round((time.perf_counter() - start) * 1000)
 
-    chunks = [hit.payload["text"] for hit in hits]
 
-    if not chunks:
-        return jsonify({"answer": "No relevant content found."})
+def retrieve(doc_id: str, q_emb: list[float]) -> tuple[list, dict]:
+    """Top chunks of the document for an embedded question; returns (hits, timings)."""
+    start = time.perf_counter()
+    hits = vector_store.search(q_emb, document_id=doc_id, limit=5)
+    return hits, {"search_ms": ms_since(start)}
+
+
+def cached_answer(doc_id: str, question: str) -> tuple[dict | None, int | None]:
+    """Exact-match lookup in the answer cache; returns (entry, document version)."""
+    cache = answer_cache()
+    if not cache:
+        return None, None
+    try:
+        version = cache.version(doc_id)
+        return cache.get(doc_id, version, question), version
+    except redis.RedisError as e:
+        print(f"Answer cache unavailable: {e}")
+        return None, None
+
+
+def similar_answer(doc_id: str, version: int | None, q_emb: list[float]) -> dict | None:
+    cache = answer_cache()
+    if not cache or version is None:
+        return None
+    try:
+        entry = cache.get_similar(doc_id, version, q_emb)
+        if not entry:
+            cache.miss()
+        return entry
+    except redis.RedisError as e:
+        print(f"Answer cache unavailable: {e}")
+        return None
+
 
+def store_answer(doc_id: str, version: int | None, question: str, q_emb: list[float],
+                 hits: list, answer: str):
+    cache = answer_cache()
+    if not cache or version is None:
+        return
+    try:
+        cache.set(
+            doc_id, version, question, q_emb,
+            [str(hit.id) for hit in hits], [hit.payload["text"] for hit in hits], answer
+        )
+    except redis.RedisError as e:
+        print(f"Answer cache unavailable: {e}")
+
+
+def build_prompt(question: str, chunks: list[str]) -> str:
     context = "\n\n---\n".join(chunks)
 
-    prompt = f"""
+    return f"""
 Answer the question using ONLY the document text below.
 
 DOCUMENT:
@@ -226,13 +983,104 @@ QUESTION:
 ANSWER:
 """
 
-    resp = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.1
-    )
 
-    return jsonify({
-        "answer": resp.choices[0].message.content.strip(),
-        "chunks": chunks
-    })
+@app.post("/api/chat/<doc_id>")
+def chat(doc_id):
+    """
+    RAG answer over one document. With {"stream": true} (or ?stream=1)
+    the answer is sent as Server-Sent Events:
+
+        event: context  {"chunks": [...], "timings": {...}}
+        data:           {"token": "..."}   (repeated)
+        event: done     {"answer": "...", "timings": {...}}
+
+    Timings break down query embedding, vector search and generation.
+    Repeated questions (exact, or near-duplicates when enabled) are
+    answered from the answer cache; "cache" in the response says which.
+    """
+    started = time.perf_counter()
+    data = request.json or {}
+    question = data.get("question", "").strip()
+    stream = bool(data.get("stream")) or request.args.get("stream") == "1"
+
+    if not question:
+        return jsonify({"error": "Empty question"}), 400
+
+    cached, version = cached_answer(doc_id, question)
+    timings = {"cache_ms": ms_since(started)}
+
+    q_emb = None
+    if not cached:
+        embed_start = time.perf_counter()
+        q_emb = embed(question)
+        timings["embed_ms"] = ms_since(embed_start)
+        cached = similar_answer(doc_id, version, q_emb)
+
+    if cached:
+        timings["total_ms"] = ms_since(started)
+        result = {"answer": cached["answer"], "chunks": cached["chunks"],
+                  "cache": cached["match"], "timings": timings}
+        if not stream:
+            return jsonify(result)
+
+        def replay():
+            yield sse({"chunks": cached["chunks"], "timings": timings}, event="context")
+            yield sse({"token": cached["answer"]})
+            yield sse(result, event="done")
+
+        return sse_response(replay())
+
+    hits, search_timings = retrieve(doc_id, q_emb)
+    timings.update(search_timings)
+    chunks = [hit.payload["text"] for hit in hits]
+
+    if not chunks:
+        return jsonify({"answer": "No relevant content found.", "timings": timings})
+
+    messages = [{"role": "user", "content": build_prompt(question, chunks)}]
+
+    if not stream:
+        generation_start = time.perf_counter()
+        resp = client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages,
+            temperature=0.1
+        )
+        answer = resp.choices[0].message.content.strip()
+        timings["generation_ms"] = ms_since(generation_start)
+        store_answer(doc_id, version, question, q_emb, hits, answer)
+        timings["total_ms"] = ms_since(started)
+
+        return jsonify({
+            "answer": answer,
+            "chunks": chunks,
+            "cache": None,
+            "timings": timings
+        })
+
+    def events():
+        yield sse({"chunks": chunks, "timings": timings}, event="context")
+
+        generation_start = time.perf_counter()
+        parts = []
+        for part in client.chat.completions.create(
+            model=CHAT_MODEL,
+            messages=messages,
+            temperature=0.1,
+            stream=True
+        ):
+            token = part.choices[0].delta.content if part.choices else None
+            if not token:
+                continue
+            if not parts:
+                timings["first_token_ms"] = ms_since(generation_start)
+            parts.append(token)
+            yield sse({"token": token})
+
+        answer = "".join(parts).strip()
+        timings["generation_ms"] = ms_since(generation_start)
+        store_answer(doc_id, version, question, q_emb, hits, answer)
+        timings["total_ms"] = ms_since(started)
+        yield sse({"answer": answer, "cache": None, "timings": timings}, event="done")
+
+    return sse_response(events())
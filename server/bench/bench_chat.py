@@ -0,0 +1,93 @@
+"""
+Perceived chat latency: blocking vs streamed answers.
+
+Point the API at the fake OpenAI server so generation time is controlled:
+
+    python bench/fake_openai.py --port 8099 --latency-ms 150 --token-ms 25
+    OPENAI_BASE_URL=http://localhost:8099/v1 OPENAI_API_KEY=x gunicorn app:app
+
+then, with a COMPLETED document id,
+
+    python bench/bench_chat.py --api http://localhost:8080 --doc <id> --concurrency 8
+
+"first token" is when the user sees the first word of the answer (the
+whole answer for the blocking mode). The server-side retrieval /
+generation breakdown of the last response is printed as well.
+"""
+import argparse
+import http.client
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def post(api: str, path: str, payload: dict) -> http.client.HTTPResponse:
+    url = urlsplit(api)
+    conn = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=120)
+    conn.request("POST", path, body=json.dumps(payload),
+                 headers={"Content-Type": "application/json"})
+    return conn.getresponse()
+
+
+def blocking(api: str, doc_id: str, question: str) -> tuple[float, float, dict]:
+    start = time.perf_counter()
+    resp = post(api, f"/api/chat/{doc_id}", {"question": question})
+    data = json.loads(resp.read())
+    total = time.perf_counter() - start
+    return total, total, data.get("timings", {})
+
+
+def streamed(api: str, doc_id: str, question: str) -> tuple[float, float, dict]:
+    start = time.perf_counter()
+    resp = post(api, f"/api/chat/{doc_id}", {"question": question, "stream": True})
+    first = None
+    timings = {}
+    event = None
+    for raw in resp:
+        line = raw.decode().rstrip("\n")
+        if line.startswith("event: "):
+            event = line[7:]
+        elif line.startswith("data: "):
+            data = json.loads(line[6:])
+            if event == "done":
+                timings = data["timings"]
+            elif "token" in data and first is None:
+                first = time.perf_counter() - start
+        elif not line:
+            event = None
+    total = time.perf_counter() - start
+    return first if first is not None else total, total, timings
+
+
+def pct(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--api", default="http://localhost:8080")
+    ap.add_argument("--doc", required=True)
+    ap.add_argument("--question", default="What is this document about?")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=64)
+    args = ap.parse_args()
+
+    print(f"{'mode':<9} {'first p50':>10} {'first p99':>10} {'total p50':>10} {'total p99':>10}  ms")
+    for name, fn in [("blocking", blocking), ("stream", streamed)]:
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(
+                lambda _: fn(args.api, args.doc, args.question), range(args.requests)
+            ))
+        firsts = [r[0] for r in results]
+        totals = [r[1] for r in results]
+        print(
+            f"{name:<9} {pct(firsts, .5):>10.0f} {pct(firsts, .99):>10.0f} "
+            f"{pct(totals, .5):>10.0f} {pct(totals, .99):>10.0f}"
+        )
+        print(f"          server: {results[-1][2]}")
+
+
+if __name__ == "__main__":
+    main()
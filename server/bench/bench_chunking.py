@@ -0,0 +1,92 @@
+"""
+Chunks per document, estimated embedding tokens and chunking throughput.
+
+    python bench/bench_chunking.py --pages 200 --runs 5
+
+"slicing" is the original fixed 500-char / 50-overlap loop; "sentences"
+is chunking.chunk_pages with the configured token budget. The generated
+document imitates OCR output: paragraphs of sentences, ragged whitespace,
+a running header/footer on every page and some repeated pages.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chunking import chunk_pages, CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS  # noqa: E402
+from embeddings import estimate_tokens  # noqa: E402
+
+WORDS = (
+    "invoice total amount due payment terms customer account balance service "
+    "period contract renewal delivery address order number tax rate subtotal "
+    "shipping discount credit note reference bank transfer reminder signature"
+).split()
+
+
+def sentence(rng: random.Random) -> str:
+    words = rng.choices(WORDS, k=rng.randint(6, 24))
+    return " ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"])
+
+
+def make_pages(n: int, seed: int = 0) -> list[tuple[int, str]]:
+    rng = random.Random(seed)
+    pages = []
+    for page in range(1, n + 1):
+        if pages and rng.random() < 0.05:
+            # Scanned twice
+            pages.append((page, pages[-1][1]))
+            continue
+        paragraphs = []
+        for _ in range(rng.randint(3, 7)):
+            text = " ".join(sentence(rng) for _ in range(rng.randint(2, 8)))
+            # Ragged OCR spacing
+            text = text.replace(" ", rng.choice([" ", "  ", " \n", "   "]), rng.randint(0, 20))
+            paragraphs.append(text)
+        body = "\n\n".join(paragraphs)
+        pages.append((page, f"ACME Corp  —  Confidential\n\n{body}\n\nPage footer   \n\n"))
+    return pages
+
+
+def slicing(text: str, size: int = 500, overlap: int = 50) -> list[str]:
+    chunks = []
+    i = 0
+    n = len(text)
+    while i < n:
+        chunk = text[i:i+size]
+        chunks.append(chunk)
+        i += size - overlap
+    return [c for c in chunks if c.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=200)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    pages = make_pages(args.pages)
+    text = "\n".join(t for _, t in pages)
+    mb = len(text.encode()) / 1e6
+    print(f"document: {args.pages} pages, {mb:.2f} MB, "
+          f"budget {CHUNK_TOKENS} tokens / overlap {CHUNK_OVERLAP_TOKENS}")
+
+    modes = {
+        "slicing": lambda: slicing(text),
+        "sentences": lambda: [c["text"] for c in chunk_pages(pages)],
+    }
+    print(f"{'mode':<10} {'chunks':>7} {'tokens':>8} {'avg tok':>8} {'MB/s':>8}")
+    for name, fn in modes.items():
+        best = float("inf")
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            chunks = fn()
+            best = min(best, time.perf_counter() - start)
+        tokens = sum(estimate_tokens(c) for c in chunks)
+        print(f"{name:<10} {len(chunks):>7} {tokens:>8} {tokens / len(chunks):>8.0f} {mb / best:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
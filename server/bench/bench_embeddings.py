@@ -0,0 +1,65 @@
+"""
+Embedding throughput: one request per chunk vs. batched requests.
+
+    python bench/bench_embeddings.py --chunks 2000 --latency-ms 80 --error-rate 0.02
+
+Runs entirely offline against bench/fake_openai.py, started in its own
+process so the stub never shares the GIL with the measured client.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_openai import spawn  # noqa: E402
+
+
+def run(embeddings, chunks, batch_size: int, concurrency: int) -> float:
+    embeddings.BATCH_SIZE = batch_size
+    embeddings.CONCURRENCY = concurrency
+    start = time.perf_counter()
+    vectors = embeddings.embed_many(chunks)
+    elapsed = time.perf_counter() - start
+    assert len(vectors) == len(chunks)
+    return len(chunks) / elapsed
+
+
+def measure(args):
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.environ["EMBED_CACHE"] = "0"  # measure the API path, not Redis
+
+    import embeddings
+
+    chunks = [f"chunk {i}: " + "lorem ipsum dolor sit amet " * 18 for i in range(args.chunks)]
+
+    # The old path: sequential, one input per request (limit run time)
+    baseline = run(embeddings, chunks[:200], batch_size=1, concurrency=1)
+    print(f"{'per-chunk (1 x 1)':<24} {baseline:10.1f} chunks/sec")
+
+    for batch_size, concurrency in [(64, 1), (256, 1), (64, 4), (256, 4)]:
+        rate = run(embeddings, chunks, batch_size, concurrency)
+        label = f"batched ({batch_size} x {concurrency})"
+        print(f"{label:<24} {rate:10.1f} chunks/sec  ({rate / baseline:.0f}x)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunks", type=int, default=2000)
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--latency-ms", type=float, default=80.0)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    args = ap.parse_args()
+
+    server = spawn(args.port, args.latency_ms, error_rate=args.error_rate)
+    try:
+        measure(args)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
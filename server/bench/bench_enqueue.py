@@ -0,0 +1,87 @@
+"""
+Job creation + enqueue throughput: one job per request vs. batches.
+
+    REDIS_URL=... DB_URL=... python bench/bench_enqueue.py --jobs 2000 --batch 500
+
+"single" is the per-upload path (create_job + queue_job: one transaction
+and one broker publish per job); "batch" is /api/upload/batch's path for
+a manifest of objects already in storage (create_jobs + queue_jobs: one
+transaction per batch, pipelined status writes, one broker connection).
+Storage transfer is not included. Jobs go to a throwaway queue that no
+worker consumes; rows, status hashes and the queue are removed afterwards.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_QUEUE = "bench_enqueue"
+os.environ["OCR_QUEUE"] = BENCH_QUEUE
+os.environ["OCR_BULK_QUEUE"] = BENCH_QUEUE
+# Publish everything instead of parking jobs behind the tenant limit
+os.environ["TENANT_LIMITS"] = '{"default": 0, "bench": 0}'
+os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+import app as api  # noqa: E402
+from models import Document  # noqa: E402
+from status_store import STATUS_PREFIX  # noqa: E402
+from tasks import celery_app  # noqa: E402
+from tenant_limits import SLOTS_PREFIX  # noqa: E402
+
+
+def single(n: int) -> list[str]:
+    ids = []
+    with api.app.app_context():
+        for i in range(n):
+            filename = f"bench-{i}.pdf"
+            job_id = api.create_job(filename, "application/pdf")
+            api.queue_job(job_id, filename, f"gs://{api.GCS_BUCKET}/bench/{filename}", None)
+            ids.append(job_id)
+    return ids
+
+
+def batch(n: int, size: int) -> list[str]:
+    ids = []
+    for start in range(0, n, size):
+        files = [(f"bench-{i}.pdf", "application/pdf") for i in range(start, min(start + size, n))]
+        job_ids = api.create_jobs(files, "bench")
+        api.queue_jobs([
+            {"job_id": job_id, "filename": filename,
+             "gcs_uri": f"gs://{api.GCS_BUCKET}/bench/{filename}", "content_hash": None}
+            for job_id, (filename, _) in zip(job_ids, files)
+        ], "bulk", "bench")
+        ids += job_ids
+    return ids
+
+
+def cleanup(ids: list[str]):
+    with api.get_session() as s:
+        s.query(Document).filter(Document.id.in_(ids)).delete(synchronize_session=False)
+        s.commit()
+    api.STATUS.r.delete(*[STATUS_PREFIX + i for i in ids])
+    for tenant, lane in [("default", "interactive"), ("bench", "bulk")]:
+        api.LIMITER.r.zrem(f"{SLOTS_PREFIX}{tenant}:{lane}", *ids)
+    with celery_app.connection_for_write() as conn:
+        conn.default_channel.queue_purge(BENCH_QUEUE)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--jobs", type=int, default=2000)
+    ap.add_argument("--batch", type=int, default=500)
+    args = ap.parse_args()
+
+    print(f"{'mode':<8} {'jobs':>6} {'seconds':>8} {'jobs/s':>8}")
+    for name, fn in [("single", lambda: single(args.jobs)),
+                     ("batch", lambda: batch(args.jobs, args.batch))]:
+        start = time.perf_counter()
+        ids = fn()
+        elapsed = time.perf_counter() - start
+        cleanup(ids)
+        print(f"{name:<8} {len(ids):>6} {elapsed:>8.2f} {len(ids) / elapsed:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
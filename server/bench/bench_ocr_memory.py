@@ -0,0 +1,78 @@
+"""
+Peak RSS of the OCR stage versus page count.
+
+    python bench/bench_ocr_memory.py --pages 10 50 200
+
+"before" reproduces the original convert_from_path(path, dpi=200) +
+sequential image_to_string; "after" is ocr.ocr_pdf_pages. Each run
+happens in a fresh interpreter so ru_maxrss is per measurement.
+Needs poppler-utils and tesseract (run inside the server image).
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+
+def make_pdf(path: str, pages: int):
+    """A scanned-looking PDF: one A4 bitmap per page at 200 DPI."""
+    from PIL import Image, ImageDraw
+
+    def page(n):
+        img = Image.new("L", (1654, 2339), 255)
+        draw = ImageDraw.Draw(img)
+        for line in range(60):
+            draw.text((120, 120 + line * 34), f"Page {n} line {line}: the quick brown fox " * 2, fill=0)
+        return img
+
+    first = page(1)
+    first.save(path, save_all=True, append_images=(page(n) for n in range(2, pages + 1)),
+               resolution=200)
+
+
+def measure(mode: str, pdf: str):
+    start = time.perf_counter()
+    if mode == "before":
+        from pdf2image import convert_from_path
+        import pytesseract
+        images = convert_from_path(pdf, dpi=200)
+        text = "\n".join(pytesseract.image_to_string(img) for img in images)
+    else:
+        from ocr import extract_text_from_pdf
+        text = extract_text_from_pdf(pdf)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"{peak_mb:.0f} {elapsed:.1f} {len(text)}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200])
+    ap.add_argument("--measure", nargs=2, metavar=("MODE", "PDF"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.measure:
+        measure(*args.measure)
+        return
+
+    print(f"{'pages':>6} {'mode':>7} {'peak RSS MB':>12} {'seconds':>8}")
+    with tempfile.TemporaryDirectory() as td:
+        for pages in args.pages:
+            pdf = os.path.join(td, f"scan_{pages}.pdf")
+            make_pdf(pdf, pages)
+            for mode in ("before", "after"):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--measure", mode, pdf],
+                    capture_output=True, text=True, check=True,
+                ).stdout.split()
+                print(f"{pages:>6} {mode:>7} {out[0]:>12} {out[1]:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+OCR latency and accuracy with and without image preprocessing.
+
+    python bench/bench_preprocess.py                # synthetic phone-photo scans
+    python bench/bench_preprocess.py --images DIR   # your own images
+
+Synthetic images are 6000x8000 renders of known text, slightly rotated
+with uneven lighting, so accuracy is the character similarity to the
+ground truth. For --images, the baseline OCR output stands in as the
+reference. Needs tesseract (run inside the server image).
+"""
+import argparse
+import difflib
+import glob
+import os
+import random
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pytesseract
+from PIL import Image, ImageDraw, ImageFont
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+import preprocess  # noqa: E402
+
+WORDS = "invoice total amount due payment account number reference date customer".split()
+
+
+def make_photo(path: str, seed: int) -> str:
+    rng = random.Random(seed)
+    lines = [" ".join(rng.choice(WORDS) for _ in range(7)) for _ in range(40)]
+    img = Image.new("L", (6000, 8000), 255)
+    draw = ImageDraw.Draw(img)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", 110)
+    except OSError:
+        font = ImageFont.load_default()
+    for i, line in enumerate(lines):
+        draw.text((400, 500 + i * 170), line, fill=0, font=font)
+    img = img.rotate(rng.uniform(-3, 3), resample=Image.BICUBIC, fillcolor=255)
+
+    # Uneven lighting gradient, as in a phone photo
+    arr = np.asarray(img, dtype=np.float32)
+    arr = arr * np.linspace(0.75, 1.0, arr.shape[1])[None, :]
+    Image.fromarray(arr.astype(np.uint8)).convert("RGB").save(path, quality=90)
+    return "\n".join(lines)
+
+
+def similarity(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, " ".join(a.split()), " ".join(b.split())).ratio()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--images", help="directory of images (default: synthetic)")
+    ap.add_argument("--count", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        if args.images:
+            cases = [(p, None) for p in sorted(glob.glob(os.path.join(args.images, "*")))]
+        else:
+            cases = []
+            for i in range(args.count):
+                path = os.path.join(td, f"photo_{i}.jpg")
+                cases.append((path, make_photo(path, i)))
+
+        print(f"{'image':<16} {'baseline s':>10} {'prep s':>8} {'base acc':>9} {'prep acc':>9}")
+        for path, truth in cases:
+            start = time.perf_counter()
+            base = pytesseract.image_to_string(Image.open(path))
+            base_s = time.perf_counter() - start
+
+            start = time.perf_counter()
+            prepared, dpi = preprocess.preprocess(Image.open(path))
+            prep = pytesseract.image_to_string(prepared, config=f"--dpi {dpi}" if dpi else "")
+            prep_s = time.perf_counter() - start
+
+            reference = truth if truth is not None else base
+            print(f"{os.path.basename(path):<16} {base_s:>10.1f} {prep_s:>8.1f} "
+                  f"{similarity(base, reference):>9.3f} {similarity(prep, reference):>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
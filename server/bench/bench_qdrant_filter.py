@@ -0,0 +1,91 @@
+"""
+Filtered (per-document) search latency versus collection size, with and
+without a keyword payload index on document_id.
+
+    docker run -d -p 6333:6333 qdrant/qdrant
+    python bench/bench_qdrant_filter.py --sizes 10000 50000 200000 --dim 384
+
+Pass --url :memory: to use the in-process local mode as a stand-in
+(functional only: it brute-forces every query and ignores indexes).
+Random vectors; each document owns --chunks-per-doc points.
+"""
+import argparse
+import statistics
+import time
+import uuid
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    Distance,
+    FieldCondition,
+    Filter,
+    MatchValue,
+    PayloadSchemaType,
+    PointStruct,
+    VectorParams,
+)
+
+
+def build(client: QdrantClient, name: str, size: int, dim: int, per_doc: int, indexed: bool):
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(name, vectors_config=VectorParams(size=dim, distance=Distance.COSINE))
+    if indexed:
+        client.create_payload_index(name, field_name="document_id", field_schema=PayloadSchemaType.KEYWORD)
+
+    rng = np.random.default_rng(0)
+    for start in range(0, size, 1000):
+        n = min(1000, size - start)
+        vectors = rng.standard_normal((n, dim), dtype=np.float32)
+        client.upsert(name, points=[
+            PointStruct(
+                id=str(uuid.uuid4()),
+                vector=vectors[i].tolist(),
+                payload={"document_id": f"doc-{(start + i) // per_doc}", "chunk_index": (start + i) % per_doc},
+            )
+            for i in range(n)
+        ])
+
+
+def measure(client: QdrantClient, name: str, size: int, dim: int, per_doc: int, queries: int) -> list[float]:
+    rng = np.random.default_rng(1)
+    docs = max(1, size // per_doc)
+    latencies = []
+    for _ in range(queries):
+        doc = f"doc-{int(rng.integers(docs))}"
+        start = time.perf_counter()
+        client.search(
+            name,
+            query_vector=rng.standard_normal(dim).tolist(),
+            limit=5,
+            query_filter=Filter(must=[FieldCondition(key="document_id", match=MatchValue(value=doc))]),
+        )
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--url", default="http://localhost:6333")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000, 200000])
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--chunks-per-doc", type=int, default=200)
+    ap.add_argument("--queries", type=int, default=200)
+    args = ap.parse_args()
+
+    client = QdrantClient(location=":memory:") if args.url == ":memory:" else QdrantClient(url=args.url)
+    name = "bench_filter"
+
+    print(f"{'points':>8} {'index':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    for size in args.sizes:
+        for indexed in (False, True):
+            build(client, name, size, args.dim, args.chunks_per_doc, indexed)
+            lat = sorted(measure(client, name, size, args.dim, args.chunks_per_doc, args.queries))
+            p99 = lat[min(len(lat) - 1, int(len(lat) * 0.99))]
+            print(f"{size:>8} {'yes' if indexed else 'no':>6} {statistics.median(lat):>8.2f} {p99:>8.2f}")
+    client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    main()
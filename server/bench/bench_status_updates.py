@@ -0,0 +1,70 @@
+"""
+StatusStore.update throughput under concurrent writers.
+
+    REDIS_URL=redis://localhost:6379/0 python bench/bench_status_updates.py --writers 16
+
+"legacy" is the original HGETALL-then-HSET update; "atomic" is the
+current single Lua round trip. Each writer pushes increasing progress
+values to one shared job, like page-range OCR subtasks do, so the final
+progress should equal the highest value written. The legacy path can
+lose that race.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from status_store import StatusStore, STATUS_PREFIX  # noqa: E402
+
+
+def legacy_update(store: StatusStore, job_id: str, **fields):
+    if "progress" in fields:
+        current = int(store.get(job_id).get("progress", 0) or 0)
+        fields["progress"] = max(int(fields["progress"]), current)
+    store.r.hset(STATUS_PREFIX + job_id, mapping={k: str(v) for k, v in fields.items()})
+
+
+def run(store: StatusStore, update, writers: int, per_writer: int) -> tuple[float, int, int]:
+    job_id = f"bench-{uuid.uuid4()}"
+    top = writers * per_writer
+
+    def writer(w: int):
+        for i in range(per_writer):
+            update(job_id, progress=i * writers + w + 1, stage=f"writer {w}")
+
+    threads = [threading.Thread(target=writer, args=(w,)) for w in range(writers)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    final = int(store.get(job_id)["progress"])
+    store.r.delete(STATUS_PREFIX + job_id)
+    return top / elapsed, final, top
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--writers", type=int, default=16)
+    ap.add_argument("--updates", type=int, default=500, help="per writer")
+    args = ap.parse_args()
+
+    store = StatusStore()
+    modes = {
+        "legacy": lambda job_id, **f: legacy_update(store, job_id, **f),
+        "atomic": store.update,
+    }
+    for name, update in modes.items():
+        rate, final, top = run(store, update, args.writers, args.updates)
+        print(f"{name:<7} {rate:10.0f} updates/s  final progress {final}/{top}"
+              f"{'' if final == top else '  (lost update)'}")
+
+
+if __name__ == "__main__":
+    main()
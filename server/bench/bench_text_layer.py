@@ -0,0 +1,99 @@
+"""
+Text-layer fast path vs. rasterize+OCR on a mixed corpus.
+
+    python bench/bench_text_layer.py --docs 6 --pages 10
+    python bench/bench_text_layer.py --corpus /path/to/pdfs
+
+Without --corpus, a synthetic mix is generated: half born-digital PDFs
+(real text layer) and half scanned (bitmap-only) PDFs. Each PDF is
+processed twice: with OCR_TEXT_LAYER forced off (every page through
+Tesseract) and with the per-page fast path. Needs poppler-utils and
+tesseract (run inside the server image).
+"""
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import ocr  # noqa: E402
+from bench_ocr_memory import make_pdf as make_scanned_pdf  # noqa: E402
+
+
+def make_text_pdf(path: str, pages: int):
+    """Minimal born-digital PDF: one Helvetica text block per page."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for n in range(1, pages + 1):
+        lines = "".join(
+            f"(Page {n} line {i}: invoice total due on receipt, thank you.) Tj T* "
+            for i in range(45)
+        )
+        stream = f"BT /F1 11 Tf 14 TL 60 780 Td {lines}ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        content_id = len(objects)
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {pages} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{o:010d} 00000 n \n" for o in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def run(pdfs: list[str], text_layer: bool) -> tuple[float, Counter]:
+    ocr.OCR_TEXT_LAYER = text_layer
+    methods = Counter()
+    start = time.perf_counter()
+    for pdf in pdfs:
+        for page in ocr.ocr_pdf_pages(pdf):
+            methods[page["method"]] += 1
+    return time.perf_counter() - start, methods
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--corpus", help="directory of PDFs (default: generate a mixed corpus)")
+    ap.add_argument("--docs", type=int, default=6)
+    ap.add_argument("--pages", type=int, default=10)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as td:
+        if args.corpus:
+            pdfs = sorted(glob.glob(os.path.join(args.corpus, "*.pdf")))
+        else:
+            pdfs = []
+            for i in range(args.docs):
+                path = os.path.join(td, f"doc_{i}.pdf")
+                (make_text_pdf if i % 2 == 0 else make_scanned_pdf)(path, args.pages)
+                pdfs.append(path)
+
+        ocr_s, ocr_methods = run(pdfs, text_layer=False)
+        fast_s, fast_methods = run(pdfs, text_layer=True)
+
+    pages = sum(ocr_methods.values())
+    print(f"{len(pdfs)} PDFs, {pages} pages")
+    print(f"OCR every page : {ocr_s:7.1f}s  {pages / ocr_s:6.1f} pages/s")
+    print(f"text-layer path: {fast_s:7.1f}s  {pages / fast_s:6.1f} pages/s  "
+          f"({fast_methods['text_layer']} text_layer, {fast_methods['ocr']} ocr)")
+    print(f"speedup        : {ocr_s / fast_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+API worker occupancy and memory for large uploads.
+
+Start the API against a local fake GCS server, e.g.
+
+    docker run -d -p 4443:4443 fsouza/fake-gcs-server -scheme http
+    STORAGE_EMULATOR_HOST=http://localhost:4443 GCS_BUCKET=bench ... gunicorn app:app
+
+then
+
+    python bench/bench_upload.py --api http://localhost:8080 --mb 1024 --pids $(pgrep -f "gunicorn")
+
+Each mode uploads the same generated body:
+  multipart  POST /api/upload          (Werkzeug spools, then re-sends)
+  stream     PUT  /api/upload/stream   (piped to GCS in chunks)
+  session    POST /api/upload/session + direct PUT to GCS + /complete
+"occupancy" is how long an API worker is busy with the request(s);
+peak RSS is sampled from /proc for the given API worker pids.
+"""
+import argparse
+import http.client
+import json
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+BLOCK = b"\0" * (1024 * 1024)
+
+
+def body(mb: int):
+    for _ in range(mb):
+        yield BLOCK
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, pids: list[int]):
+        super().__init__(daemon=True)
+        self.pids, self.peak, self.running = pids, 0.0, True
+
+    def run(self):
+        while self.running:
+            self.peak = max([self.peak] + [rss_mb(p) for p in self.pids])
+            time.sleep(0.05)
+
+
+def request(url: str, method: str, path: str, data=None, headers=None):
+    parts = urlsplit(url)
+    conn_cls = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    conn = conn_cls(parts.netloc, timeout=3600)
+    conn.request(method, path or "/", body=data, headers=headers or {}, encode_chunked=data is not None and not isinstance(data, (bytes, str)))
+    resp = conn.getresponse()
+    payload = resp.read()
+    conn.close()
+    return resp.status, payload
+
+
+def multipart(api: str, mb: int) -> float:
+    boundary = uuid.uuid4().hex
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.pdf\"\r\n"
+            f"Content-Type: application/pdf\r\n\r\n").encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+
+    def parts():
+        yield head
+        yield from body(mb)
+        yield tail
+
+    start = time.perf_counter()
+    request(api, "POST", "/api/upload", parts(),
+            {"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    return time.perf_counter() - start
+
+
+def stream(api: str, mb: int) -> float:
+    start = time.perf_counter()
+    request(api, "PUT", "/api/upload/stream?filename=big.pdf", body(mb),
+            {"Content-Type": "application/pdf"})
+    return time.perf_counter() - start
+
+
+def session(api: str, mb: int) -> float:
+    start = time.perf_counter()
+    _, payload = request(api, "POST", "/api/upload/session",
+                         json.dumps({"filename": "big.pdf", "content_type": "application/pdf"}),
+                         {"Content-Type": "application/json"})
+    info = json.loads(payload)
+    busy = time.perf_counter() - start
+
+    # The bytes go straight to storage; no API worker is involved
+    upload = urlsplit(info["upload_url"])
+    request(f"{upload.scheme}://{upload.netloc}", "PUT",
+            f"{upload.path}?{upload.query}", body(mb), {"Content-Type": "application/pdf"})
+
+    start = time.perf_counter()
+    request(api, "POST", f"/api/upload/{info['job_id']}/complete")
+    return busy + time.perf_counter() - start
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--api", default="http://localhost:8080")
+    ap.add_argument("--mb", type=int, default=1024)
+    ap.add_argument("--pids", type=int, nargs="*", default=[])
+    args = ap.parse_args()
+
+    print(f"{'mode':<10} {'occupancy s':>12} {'peak RSS MB':>12}")
+    for name, fn in [("multipart", multipart), ("stream", stream), ("session", session)]:
+        sampler = RssSampler(args.pids)
+        sampler.start()
+        busy = fn(args.api, args.mb)
+        sampler.running = False
+        sampler.join()
+        peak = f"{sampler.peak:.0f}" if args.pids else "-"
+        print(f"{name:<10} {busy:>12.1f} {peak:>12}")
+
+
+if __name__ == "__main__":
+    main()
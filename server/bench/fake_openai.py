@@ -0,0 +1,200 @@
+"""
+Local stand-in for the OpenAI embeddings and chat completions APIs, for
+offline tests and benchmarks.
+
+    python bench/fake_openai.py --port 8099 --latency-ms 80 --token-ms 20 --error-rate 0.05
+
+Point the server code at it with:
+
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=fake
+
+Benchmarks should start it with spawn(), in its own process, so building
+responses never competes with the measured client for the GIL.
+"""
+import argparse
+import array
+import base64
+import hashlib
+import json
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIM = 1536
+# Responses draw from a fixed pool of vectors, built once, so serving
+# costs next to nothing compared with the simulated latency
+POOL_SIZE = 256
+
+
+def _make_pool(size: int = POOL_SIZE, dim: int = DIM) -> list[tuple[list[float], str]]:
+    rng = random.Random(0)
+    pool = []
+    for _ in range(size):
+        vector = array.array("f", (rng.uniform(-1, 1) for _ in range(dim)))
+        pool.append((vector.tolist(), base64.b64encode(vector.tobytes()).decode()))
+    return pool
+
+
+POOL = _make_pool()
+
+
+def fake_vector(text: str, encoding_format: str = "float"):
+    """Deterministic pseudo-embedding: identical inputs map to identical vectors."""
+    n = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8], "little") % POOL_SIZE
+    floats, b64 = POOL[n]
+    return b64 if encoding_format == "base64" else floats
+
+
+class Handler(BaseHTTPRequestHandler):
+    latency_ms = 50.0
+    per_input_ms = 0.2
+    token_ms = 20.0
+    error_rate = 0.0
+    requests = 0
+    inputs = 0
+    lock = threading.Lock()
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, code: int, body: dict, headers: dict | None = None):
+        data = json.dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        if random.random() < self.error_rate:
+            self._send(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                       {"retry-after": "0.1"})
+            return
+
+        if self.path.endswith("/embeddings"):
+            inputs = body.get("input", [])
+            if isinstance(inputs, str):
+                inputs = [inputs]
+            with Handler.lock:
+                Handler.requests += 1
+                Handler.inputs += len(inputs)
+            time.sleep((self.latency_ms + self.per_input_ms * len(inputs)) / 1000)
+            self._send(200, {
+                "object": "list",
+                "model": body.get("model", "fake"),
+                "data": [
+                    {"object": "embedding", "index": i,
+                     "embedding": fake_vector(t, body.get("encoding_format", "float"))}
+                    for i, t in enumerate(inputs)
+                ],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0},
+            })
+            return
+
+        if self.path.endswith("/chat/completions"):
+            self._chat(body)
+            return
+
+        self._send(404, {"error": {"message": f"unknown path {self.path}"}})
+
+    def _chat(self, body: dict):
+        prompt = body.get("messages", [{}])[-1].get("content", "")
+        answer = f"This is a stub answer generated from {len(prompt)} characters of context."
+        tokens = [w + " " for w in answer.split()]
+        model = body.get("model", "fake")
+        time.sleep(self.latency_ms / 1000)
+
+        if not body.get("stream"):
+            time.sleep(self.token_ms * len(tokens) / 1000)
+            self._send(200, {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": answer},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": 0},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def chunk(delta: dict, finish: str | None = None) -> bytes:
+            return ("data: " + json.dumps({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }) + "\n\n").encode()
+
+        self.wfile.write(chunk({"role": "assistant", "content": ""}))
+        for token in tokens:
+            time.sleep(self.token_ms / 1000)
+            self.wfile.write(chunk({"content": token}))
+            self.wfile.flush()
+        self.wfile.write(chunk({}, finish="stop"))
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+def serve(port: int = 8099, latency_ms: float = 50.0, per_input_ms: float = 0.2,
+          error_rate: float = 0.0, token_ms: float = 20.0) -> ThreadingHTTPServer:
+    """Starts the fake server on a background thread and returns it."""
+    Handler.latency_ms = latency_ms
+    Handler.per_input_ms = per_input_ms
+    Handler.token_ms = token_ms
+    Handler.error_rate = error_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def spawn(port: int = 8099, latency_ms: float = 50.0, per_input_ms: float = 0.2,
+          error_rate: float = 0.0, token_ms: float = 20.0, timeout: float = 30.0) -> subprocess.Popen:
+    """Runs the fake server in a child process; returns once it accepts connections."""
+    proc = subprocess.Popen([
+        sys.executable, __file__, "--port", str(port), "--latency-ms", str(latency_ms),
+        "--per-input-ms", str(per_input_ms), "--error-rate", str(error_rate),
+        "--token-ms", str(token_ms),
+    ], stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return proc
+        except OSError:
+            if proc.poll() is not None or time.monotonic() > deadline:
+                proc.kill()
+                raise RuntimeError(f"fake OpenAI server did not start on port {port}")
+            time.sleep(0.1)
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--port", type=int, default=8099)
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--per-input-ms", type=float, default=0.2)
+    ap.add_argument("--error-rate", type=float, default=0.0)
+    ap.add_argument("--token-ms", type=float, default=20.0)
+    args = ap.parse_args()
+
+    serve(args.port, args.latency_ms, args.per_input_ms, args.error_rate, args.token_ms)
+    print(f"Fake OpenAI listening on http://127.0.0.1:{args.port}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,151 @@
+"""
+API latency and throughput under many concurrent, I/O-bound requests.
+
+Runs a mix of slow requests (RAG chat against a slow LLM) and fast ones
+(health + status checks) and reports p50/p99 per kind and requests/sec.
+With --launch, gunicorn is started once per serving mode, e.g.
+
+    python bench/fake_openai.py --port 8099 --latency-ms 500 --token-ms 10
+    OPENAI_BASE_URL=http://localhost:8099/v1 OPENAI_API_KEY=x CHAT_CACHE=0 \\
+        python bench/loadtest.py --launch gthread gevent --doc <id> --concurrency 500
+
+(run from server/ with the usual REDIS_URL / DB_URL / QDRANT_URL env).
+Without --launch it measures whatever is listening on --api.
+
+The client is a bare asyncio HTTP/1.1 client so it is not the bottleneck.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+async def request(host: str, port: int, method: str, path: str,
+                  payload: dict | None = None, timeout: float = 120) -> int:
+    body = json.dumps(payload).encode() if payload is not None else b""
+    head = (
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n"
+    ).encode()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        writer.write(head + body)
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+def pct(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+
+async def run(api: str, doc: str | None, concurrency: int, duration: float,
+              slow_share: float) -> dict:
+    url = urlsplit(api)
+    host, port = url.hostname, url.port or 80
+    latencies = {"fast": [], "slow": []}
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            if doc and random.random() < slow_share:
+                kind, args = "slow", ("POST", f"/api/chat/{doc}", {"question": "What is the total?"})
+            elif random.random() < 0.5:
+                kind, args = "fast", ("GET", "/api/health", None)
+            else:
+                kind, args = "fast", ("GET", "/api/status?ids=loadtest", None)
+
+            start = time.perf_counter()
+            try:
+                status = await request(host, port, *args)
+            except (OSError, asyncio.TimeoutError, IndexError, ValueError):
+                status = 0
+            if status != 200:
+                errors += 1
+                continue
+            latencies[kind].append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in latencies.values())
+    return {"latencies": latencies, "errors": errors, "rps": total / elapsed}
+
+
+def wait_ready(api: str, timeout: float = 60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(api + "/api/health", timeout=2)
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"API at {api} did not come up")
+
+
+def report(label: str, result: dict):
+    fast, slow = result["latencies"]["fast"], result["latencies"]["slow"]
+    print(
+        f"{label:<8} {result['rps']:>8.0f} {pct(fast, .5):>9.0f} {pct(fast, .99):>9.0f} "
+        f"{pct(slow, .5):>9.0f} {pct(slow, .99):>9.0f} {result['errors']:>7}"
+    )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--api", default="http://127.0.0.1:8080")
+    ap.add_argument("--launch", nargs="*", default=[], help="serving modes to start, e.g. gthread gevent")
+    ap.add_argument("--doc", help="COMPLETED document id for the slow chat requests")
+    ap.add_argument("--concurrency", type=int, default=200)
+    ap.add_argument("--duration", type=float, default=30)
+    ap.add_argument("--slow-share", type=float, default=0.2)
+    args = ap.parse_args()
+
+    print(f"{'mode':<8} {'req/s':>8} {'fast p50':>9} {'fast p99':>9} "
+          f"{'slow p50':>9} {'slow p99':>9} {'errors':>7}   (ms)")
+
+    if not args.launch:
+        report("running", asyncio.run(run(
+            args.api, args.doc, args.concurrency, args.duration, args.slow_share
+        )))
+        return
+
+    port = urlsplit(args.api).port or 8080
+    for mode in args.launch:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "gunicorn", "-c", "gunicorn_config.py",
+             "-b", f"127.0.0.1:{port}", "app:app"],
+            cwd=SERVER_DIR,
+            env={**os.environ, "API_SERVING_MODE": mode},
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_ready(args.api)
+            report(mode, asyncio.run(run(
+                args.api, args.doc, args.concurrency, args.duration, args.slow_share
+            )))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
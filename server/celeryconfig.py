@@ -4,3 +4,29 @@ broker_url = os.environ.get("REDIS_URL", "redis://redis:6379/0")
 result_backend = os.environ.get("REDIS_URL", "redis://redis:6379/0")
 imports = ("tasks",)
 worker_hijack_root_logger = False
+
+# Interactive uploads and bulk backfills get separate queues (see
+# tasks.LANES). Within a queue, the Redis transport emulates priorities
+# with one list per step; lower numbers are served first.
+task_default_queue = os.environ.get("OCR_QUEUE", "ocr")
+broker_transport_options = {
+    "priority_steps": list(range(10)),
+    "sep": ":",
+    "queue_order_strategy": "priority",
+}
+# Don't let a worker reserve a backlog of bulk jobs ahead of new uploads
+worker_prefetch_multiplier = 1
+# Tasks per worker container. Each task OCRs pages on OCR_WORKERS threads
+# (ocr.py), which defaults to cpu_count // this, so the two together use
+# about one tesseract/pdftoppm process per core.
+worker_concurrency = int(os.environ.get("OCR_WORKER_CONCURRENCY", "2"))
+
+# Hands slots leaked by killed workers to waiting jobs (tasks.sweep_tenant_slots).
+# Beat runs embedded in the worker-bulk container (-B).
+beat_schedule = {
+    "sweep-tenant-slots": {
+        "task": "tasks.sweep_tenant_slots",
+        "schedule": float(os.environ.get("TENANT_SWEEP_SECONDS", "60")),
+    },
+}
+beat_schedule_filename = os.environ.get("CELERY_BEAT_SCHEDULE", "/tmp/celerybeat-schedule")
@@ -0,0 +1,141 @@
+import os
+import re
+
+import numpy as np
+
+# Chunk budget in (estimated) tokens, and how much trailing context the
+# next chunk repeats. ~4 chars per token, as in embeddings.estimate_tokens.
+CHUNK_TOKENS = int(os.environ.get("CHUNK_TOKENS", "200"))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", "30"))
+CHARS_PER_TOKEN = 4
+
+# Sentence end (punctuation, closing quotes/brackets, whitespace) or a
+# blank line between paragraphs.
+BOUNDARY = re.compile(r"([.!?][\"')\]]*\s+|\n\s*\n)")
+WORD = re.compile(r"\w")
+
+
+def _lengths(strings) -> np.ndarray:
+    return np.fromiter(map(len, strings), dtype=np.int64)
+
+
+def sentence_spans(text: str, max_chars: int) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (starts, ends) of the sentences in text. Sentences longer than
+    max_chars are cut at whitespace so every span fits in one chunk.
+
+    One re.split does the scanning; offsets come from cumulative part
+    lengths, so there is no Python-level work per sentence.
+    """
+    parts = BOUNDARY.split(text)
+    pieces, separators = parts[0::2], parts[1::2]
+    offsets = np.concatenate(([0], np.cumsum(_lengths(parts))[:-1]))
+
+    lengths = _lengths(pieces)
+    leading = lengths - _lengths(map(str.lstrip, pieces))
+    stripped = _lengths(map(str.rstrip, pieces))
+    # Sentence-ending punctuation lives in the separator that follows
+    punct = np.append(_lengths(map(str.rstrip, separators)), 0)
+
+    starts = offsets[0::2] + leading
+    ends = offsets[0::2] + np.where(punct > 0, lengths + punct, stripped)
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if not len(starts) or (ends - starts).max() <= max_chars:
+        return starts, ends
+
+    out_starts, out_ends = [], []
+    for start, end in zip(starts.tolist(), ends.tolist()):
+        while end - start > max_chars:
+            cut = text.rfind(" ", start + 1, start + max_chars)
+            cut = cut if cut > start else start + max_chars
+            out_starts.append(start)
+            out_ends.append(cut)
+            start = cut
+            while start < end and text[start].isspace():
+                start += 1
+        if end > start:
+            out_starts.append(start)
+            out_ends.append(end)
+    return np.array(out_starts, dtype=np.int64), np.array(out_ends, dtype=np.int64)
+
+
+def pack(tokens: np.ndarray, max_tokens: int, overlap_tokens: int) -> list[tuple[int, int]]:
+    """
+    Greedy packing of consecutive sentences into chunks of at most
+    max_tokens; returns [first, last) sentence ranges. Each chunk after the
+    first starts with up to overlap_tokens of the previous chunk's
+    sentences and adds at least one new one. Chunk ends are found with
+    searchsorted on the cumulative token counts rather than by walking
+    sentences one at a time.
+    """
+    cum = np.cumsum(tokens)
+    n = len(cum)
+    ranges = []
+    i = 0
+    while i < n:
+        base = cum[i - 1] if i else 0
+        j = max(int(np.searchsorted(cum, base + max_tokens, side="right")), i + 1)
+        if ranges and j <= ranges[-1][1]:
+            # The overlap leaves no room for a new sentence; start fresh
+            i = ranges[-1][1]
+            continue
+        ranges.append((i, j))
+        if j >= n:
+            break
+        k = int(np.searchsorted(cum, cum[j - 1] - overlap_tokens, side="left")) + 1
+        i = max(k, i + 1)
+    return ranges
+
+
+class Chunker:
+    """
+    Sentence/paragraph-aware chunking that is fed one page at a time.
+
+    Chunks never span pages. Each chunk carries its page number and the
+    [char_start, char_end) offsets into the newline-joined document text;
+    the chunk text itself has whitespace collapsed. Chunks without any word
+    characters, and repeats of an earlier chunk (running headers and
+    footers, OCR of duplicated pages), are skipped.
+    """
+
+    def __init__(self, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.offset = 0
+        self.index = 0
+        self.seen = set()
+
+    def add_page(self, page: int, text: str) -> list[dict]:
+        starts, ends = sentence_spans(text, self.max_tokens * CHARS_PER_TOKEN)
+        offset = self.offset
+        self.offset += len(text) + 1
+
+        chunks = []
+        if not len(starts):
+            return chunks
+
+        tokens = (ends - starts) // CHARS_PER_TOKEN + 1
+        for first, last in pack(tokens, self.max_tokens, self.overlap_tokens):
+            start, end = int(starts[first]), int(ends[last - 1])
+            chunk = " ".join(text[start:end].split())
+            key = chunk.casefold()
+            if not WORD.search(chunk) or key in self.seen:
+                continue
+            self.seen.add(key)
+            chunks.append({
+                "chunk_index": self.index,
+                "text": chunk,
+                "page": page,
+                "char_start": offset + start,
+                "char_end": offset + end,
+            })
+            self.index += 1
+        return chunks
+
+
+def chunk_pages(pages, max_tokens: int = CHUNK_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS):
+    """Yields chunk dicts for an iterable of (page, text), page by page."""
+    chunker = Chunker(max_tokens, overlap_tokens)
+    for page, text in pages:
+        yield from chunker.add_page(page, text)
@@ -6,10 +6,23 @@ from sqlalchemy.exc import OperationalError
 
 DB_URL = os.environ.get("DB_URL", "postgresql+psycopg2://ocr:ocr@db:5432/ocr")
 
+# Connections per process. Under the gevent serving mode many more requests
+# are in flight than there are connections; extra ones wait up to
+# DB_POOL_TIMEOUT seconds for a free connection.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", "30"))
+
 # Retry loop for DB readiness
 for i in range(10):
     try:
-        engine = create_engine(DB_URL, pool_pre_ping=True)
+        engine = create_engine(
+            DB_URL,
+            pool_pre_ping=True,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
         conn = engine.connect()
         conn.close()
         break
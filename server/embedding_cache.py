@@ -0,0 +1,71 @@
+import array
+import hashlib
+import os
+import re
+import unicodedata
+import redis
+
+from redis_lru import RedisLRU, hit_rate
+
+CACHE_PREFIX = "emb:"
+
+
+def normalize(text: str) -> str:
+    """Canonical form used for hashing: NFKC, collapsed whitespace."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache keyed by (model, sha256(normalized text)).
+
+    Vectors are stored as packed float32. Entries expire after `ttl` seconds
+    without a hit, and the least recently used entries are trimmed once the
+    cache holds more than `max_entries`.
+    """
+
+    def __init__(self, url: str | None = None, ttl: int | None = None,
+                 max_entries: int | None = None):
+        self.r = redis.Redis.from_url(url or os.environ.get("REDIS_URL"))
+        self.ttl = ttl or int(os.environ.get("EMBED_CACHE_TTL", 30 * 86400))
+        self.max_entries = max_entries or int(os.environ.get("EMBED_CACHE_MAX_ENTRIES", 50000))
+        self.lru = RedisLRU(self.r, CACHE_PREFIX, self.ttl, self.max_entries)
+
+    def key(self, model: str, text: str) -> str:
+        digest = hashlib.sha256(normalize(text).encode()).hexdigest()
+        return f"{CACHE_PREFIX}{model}:{digest}"
+
+    def get_many(self, model: str, texts: list[str]) -> list[list[float] | None]:
+        keys = [self.key(model, t) for t in texts]
+        pipe = self.r.pipeline(transaction=False)
+        for k in keys:
+            pipe.getex(k, ex=self.ttl)
+        raw = pipe.execute()
+
+        hits = [k for k, v in zip(keys, raw) if v is not None]
+        pipe = self.r.pipeline(transaction=False)
+        self.lru.touch(pipe, hits)
+        self.lru.count(pipe, hits=len(hits), misses=len(keys) - len(hits))
+        pipe.execute()
+
+        return [array.array("f", v).tolist() if v is not None else None for v in raw]
+
+    def set_many(self, model: str, texts: list[str], vectors: list[list[float]]):
+        pipe = self.r.pipeline(transaction=False)
+        keys = []
+        for t, vec in zip(texts, vectors):
+            k = self.key(model, t)
+            pipe.set(k, array.array("f", vec).tobytes(), ex=self.ttl)
+            keys.append(k)
+        self.lru.add(pipe, keys)
+
+    def stats(self) -> dict:
+        raw = self.lru.counters()
+        hits, misses = raw.get("hits", 0), raw.get("misses", 0)
+        return {
+            "hits": hits,
+            "misses": misses,
+            "evictions": raw["evictions"],
+            "hit_rate": hit_rate(hits, hits + misses),
+            "entries": raw["entries"],
+        }
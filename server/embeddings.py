@@ -0,0 +1,153 @@
+import os
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import redis
+from openai import OpenAI, RateLimitError, APIStatusError, APIConnectionError
+
+from embedding_cache import EmbeddingCache, normalize
+
+EMBEDDING_MODEL = os.environ.get("EMBEDDING_MODEL", "text-embedding-3-small")
+EMBEDDING_DIM = 1536
+
+# The API accepts up to 2048 inputs / ~300k tokens per request
+BATCH_SIZE = int(os.environ.get("EMBED_BATCH_SIZE", "256"))
+BATCH_TOKENS = int(os.environ.get("EMBED_BATCH_TOKENS", "100000"))
+CONCURRENCY = int(os.environ.get("EMBED_CONCURRENCY", "4"))
+MAX_RETRIES = int(os.environ.get("EMBED_MAX_RETRIES", "6"))
+MAX_INPUT_CHARS = 8000
+CACHE_ENABLED = os.environ.get("EMBED_CACHE", "1") == "1"
+
+_client = None
+_cache = None
+
+
+def client():
+    """
+    Returns a singleton OpenAI client.
+    Retries are handled here so backoff is shared by all batches.
+    """
+    global _client
+    if _client is None:
+        _client = OpenAI(max_retries=0)
+    return _client
+
+
+def cache() -> EmbeddingCache | None:
+    global _cache
+    if _cache is None and CACHE_ENABLED:
+        _cache = EmbeddingCache()
+    return _cache
+
+
+def estimate_tokens(text: str) -> int:
+    # ~4 chars per token for English; good enough for budgeting
+    return len(text) // 4 + 1
+
+
+def make_batches(texts: list[str]) -> list[list[int]]:
+    """
+    Groups input indexes into batches bounded by BATCH_SIZE and BATCH_TOKENS.
+    """
+    batches, current, tokens = [], [], 0
+    for i, t in enumerate(texts):
+        cost = estimate_tokens(t)
+        if current and (len(current) >= BATCH_SIZE or tokens + cost > BATCH_TOKENS):
+            batches.append(current)
+            current, tokens = [], 0
+        current.append(i)
+        tokens += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _retry_delay(attempt: int, err: Exception) -> float:
+    response = getattr(err, "response", None)
+    retry_after = response.headers.get("retry-after") if response is not None else None
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    return min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random())
+
+
+def _embed_request(inputs: list[str]) -> list[list[float]]:
+    """
+    One embeddings API call with backoff on 429, 5xx and connection errors.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        try:
+            resp = client().embeddings.create(model=EMBEDDING_MODEL, input=inputs)
+            # The API tags each vector with its input index
+            return [d.embedding for d in sorted(resp.data, key=lambda d: d.index)]
+        except (RateLimitError, APIConnectionError) as e:
+            err = e
+        except APIStatusError as e:
+            if e.status_code < 500:
+                raise
+            err = e
+        if attempt == MAX_RETRIES:
+            raise err
+        time.sleep(_retry_delay(attempt, err))
+
+
+def _embed_uncached(texts: list[str]) -> list[list[float]]:
+    batches = make_batches(texts)
+    vectors = [None] * len(texts)
+    if not batches:
+        return vectors
+
+    with ThreadPoolExecutor(max_workers=min(CONCURRENCY, len(batches))) as pool:
+        results = pool.map(lambda b: _embed_request([texts[i] for i in b]), batches)
+        for batch, embs in zip(batches, results):
+            for i, emb in zip(batch, embs):
+                vectors[i] = emb
+
+    return vectors
+
+
+def embed_many(texts: list[str]) -> list[list[float]]:
+    """
+    Embeds many texts with batched, bounded-concurrency API calls.
+    Identical texts (after normalization) are embedded once, and the
+    embedding cache is consulted before calling the API.
+    Returns vectors in input order; blank texts get a zero vector.
+    """
+    clean = [normalize(t)[:MAX_INPUT_CHARS] for t in texts]
+    vectors = [[0.0] * EMBEDDING_DIM for _ in clean]
+
+    positions: dict[str, list[int]] = {}
+    for i, t in enumerate(clean):
+        if t:
+            positions.setdefault(t, []).append(i)
+    unique = list(positions)
+    if not unique:
+        return vectors
+
+    found = [None] * len(unique)
+    if cache():
+        try:
+            found = cache().get_many(EMBEDDING_MODEL, unique)
+        except redis.RedisError as e:
+            print(f"Embedding cache unavailable: {e}")
+
+    missing = [t for t, v in zip(unique, found) if v is None]
+    fresh = dict(zip(missing, _embed_uncached(missing)))
+    if fresh and cache():
+        try:
+            cache().set_many(EMBEDDING_MODEL, list(fresh), list(fresh.values()))
+        except redis.RedisError as e:
+            print(f"Embedding cache unavailable: {e}")
+
+    for t, v in zip(unique, found):
+        for i in positions[t]:
+            vectors[i] = v if v is not None else fresh[t]
+
+    return vectors
+
+
+def embed(text: str) -> list[float]:
+    return embed_many([text])[0]
@@ -1,4 +1,4 @@
 #!/bin/bash
 set -e
-echo "Starting Flask API..."
-exec gunicorn -b 0.0.0.0:8080 app:app --workers 2 --threads 4 --timeout 180
\ No newline at end of file
+echo "Starting Flask API (${API_SERVING_MODE:-gevent})..."
+exec gunicorn -c gunicorn_config.py app:app
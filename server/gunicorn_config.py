@@ -1,4 +1,38 @@
+import os
+
 bind = "0.0.0.0:8080"
-workers = 2
-threads = 4
-worker_class = "gthread"
+workers = int(os.environ.get("API_WORKERS", "2"))
+timeout = int(os.environ.get("API_TIMEOUT", "180"))
+
+# gthread: one OS thread per in-flight request (workers x threads total).
+# gevent:  one greenlet per request; blocking socket I/O (Redis, Postgres,
+#          Qdrant, OpenAI, GCS) yields instead of holding a thread, so a
+#          worker can keep thousands of slow requests / SSE streams open.
+# gevent is the default: SSE status streams and streamed chat keep
+# requests open for a long time.
+SERVING_MODE = os.environ.get("API_SERVING_MODE", "gevent")
+
+if SERVING_MODE == "gevent":
+    worker_class = "gevent"
+    worker_connections = int(os.environ.get("API_WORKER_CONNECTIONS", "2000"))
+else:
+    worker_class = "gthread"
+    threads = int(os.environ.get("API_THREADS", "4"))
+
+
+def post_fork(server, worker):
+    if SERVING_MODE != "gevent":
+        return
+
+    # psycopg2 is a C extension; make its socket waits cooperative too.
+    # Before the app is loaded, so no connection is opened in blocking mode.
+    from psycogreen.gevent import patch_psycopg
+    patch_psycopg()
+
+
+def post_worker_init(worker):
+    # gRPC must be initialised after GeventWorker.init_process() has
+    # monkey-patched the stdlib, which happens after post_fork
+    if SERVING_MODE == "gevent" and os.environ.get("QDRANT_PREFER_GRPC", "0") == "1":
+        import grpc.experimental.gevent
+        grpc.experimental.gevent.init_gevent()
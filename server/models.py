@@ -1,9 +1,20 @@
-from sqlalchemy import String, Text, DateTime, Index
+from sqlalchemy import String, Text, DateTime, Index, Computed, Integer
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.sql import func
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime
 from db import Base
 
+# Weighted full-text document: filename > tags > text > entities.
+# For the jsonb columns only string values are indexed, not keys.
+SEARCH_VECTOR_EXPR = (
+    "setweight(to_tsvector('english', coalesce(filename, '')), 'A') || "
+    "setweight(to_tsvector('english', tags), 'B') || "
+    "setweight(to_tsvector('english', coalesce(text, '')), 'C') || "
+    "setweight(to_tsvector('english', entities), 'D')"
+)
+
+
 class Document(Base):
     __tablename__ = "documents"
 
@@ -12,10 +23,26 @@ class Document(Base):
     mime: Mapped[str] = mapped_column(String(128), default="")
     gcs_uri: Mapped[str] = mapped_column(String(1024))
     status: Mapped[str] = mapped_column(String(64), default="RECEIVED")
+    # sha256 of the uploaded bytes, used to skip reprocessing duplicates
+    content_hash: Mapped[str | None] = mapped_column(String(64), nullable=True)
+    # Uploader (X-Tenant-Id); concurrency limits are applied per tenant
+    tenant: Mapped[str] = mapped_column(String(64), default="default", server_default="default")
+
+    # Heavy columns are never loaded with the row; read them explicitly
+    # (select(Document.text) / undefer) where they are really needed.
+    text: Mapped[str | None] = mapped_column(
+        Text, nullable=True, deferred=True, deferred_raiseload=True
+    )
+    # [{"text": ..., "label": ...}]
+    entities: Mapped[list] = mapped_column(
+        JSONB, default=list, server_default="[]", deferred=True, deferred_raiseload=True
+    )
+    tags: Mapped[list] = mapped_column(JSONB, default=list, server_default="[]")
 
-    text: Mapped[str | None] = mapped_column(Text, nullable=True)
-    entities_json: Mapped[str] = mapped_column(Text, default="[]")
-    tags_json: Mapped[str] = mapped_column(Text, default="[]")
+    # Maintained by Postgres whenever text/tags/entities are written
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR, Computed(SEARCH_VECTOR_EXPR, persisted=True), deferred=True
+    )
 
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), server_default=func.now()
@@ -27,4 +54,55 @@ class Document(Base):
     __table_args__ = (
         Index("idx_doc_filename", "filename"),
         Index("idx_doc_status", "status"),
+        Index("idx_doc_content_hash", "content_hash"),
+        Index("idx_doc_tenant_created", "tenant", "created_at"),
+        # Keyset pagination of /api/documents
+        Index("idx_doc_created", "created_at", "id"),
+        Index("idx_doc_search", "search_vector", postgresql_using="gin"),
+        # tags ?| array[...] (any of) and @> lookups
+        Index("idx_doc_tags", "tags", postgresql_using="gin"),
+        # entities @> '[{"label": "ORG"}]' lookups
+        Index("idx_doc_entities", "entities", postgresql_using="gin",
+              postgresql_ops={"entities": "jsonb_path_ops"}),
     )
+
+
+class SchemaVersion(Base):
+    """Single row: how many SCHEMA_UPGRADES the database has applied."""
+    __tablename__ = "schema_version"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+
+
+# Idempotent DDL for databases created before a column/index existed.
+# create_all() only creates missing tables, never missing columns.
+# Append only: entries past the stored SchemaVersion are the ones run.
+SCHEMA_UPGRADES = [
+    # tags_json / entities_json (JSON in text columns) -> jsonb. The
+    # generated search_vector depends on them, so it is dropped here and
+    # re-created from the new columns below.
+    """
+    DO $$
+    BEGIN
+      IF EXISTS (SELECT 1 FROM information_schema.columns
+                 WHERE table_name = 'documents' AND column_name = 'tags_json') THEN
+        ALTER TABLE documents ADD COLUMN IF NOT EXISTS tags jsonb NOT NULL DEFAULT '[]'::jsonb;
+        ALTER TABLE documents ADD COLUMN IF NOT EXISTS entities jsonb NOT NULL DEFAULT '[]'::jsonb;
+        UPDATE documents SET tags = coalesce(tags_json, '[]')::jsonb,
+                             entities = coalesce(entities_json, '[]')::jsonb;
+        ALTER TABLE documents DROP COLUMN IF EXISTS search_vector;
+        ALTER TABLE documents DROP COLUMN tags_json, DROP COLUMN entities_json;
+      END IF;
+    END $$
+    """,
+    f"ALTER TABLE documents ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    f"GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPR}) STORED",
+    "CREATE INDEX IF NOT EXISTS idx_doc_search ON documents USING gin (search_vector)",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash varchar(64)",
+    "CREATE INDEX IF NOT EXISTS idx_doc_content_hash ON documents (content_hash)",
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS tenant varchar(64) NOT NULL DEFAULT 'default'",
+    "CREATE INDEX IF NOT EXISTS idx_doc_tenant_created ON documents (tenant, created_at)",
+    "CREATE INDEX IF NOT EXISTS idx_doc_tags ON documents USING gin (tags)",
+    "CREATE INDEX IF NOT EXISTS idx_doc_entities ON documents USING gin (entities jsonb_path_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_doc_created ON documents (created_at, id)",
+]
@@ -0,0 +1,114 @@
+import os
+import re
+import time
+from collections import Counter
+
+import spacy
+
+# spaCy's default max_length is 1M chars; parse in bounded segments instead
+NLP_SEGMENT_CHARS = int(os.environ.get("NLP_SEGMENT_CHARS", "100000"))
+NLP_BATCH_SIZE = int(os.environ.get("NLP_BATCH_SIZE", "4"))
+# >1 forks spaCy workers; only usable when Celery runs with a non-daemonic
+# pool (--pool threads/solo), since prefork children cannot have children
+NLP_PROCESSES = int(os.environ.get("NLP_PROCESSES", "1"))
+
+# Entities need ner; noun chunks need tagger + attribute_ruler + parser.
+# The lemmatizer is never used.
+NLP = spacy.load("en_core_web_sm", disable=["lemmatizer"])
+
+
+# ============================================================
+# Segmentation
+# ============================================================
+def split_segments(text: str, limit: int = NLP_SEGMENT_CHARS) -> list[str]:
+    """
+    Packs paragraphs into segments of at most `limit` chars. A paragraph
+    longer than the limit is cut at the last whitespace before it.
+    """
+    segments, current = [], ""
+    for para in re.split(r"\n\s*\n", text):
+        # Keep document order: flush what is pending before cutting
+        if len(para) > limit and current:
+            segments.append(current)
+            current = ""
+        while len(para) > limit:
+            cut = para.rfind(" ", 0, limit)
+            cut = cut if cut > 0 else limit
+            segments.append(para[:cut])
+            para = para[cut:]
+        if current and len(current) + len(para) + 2 > limit:
+            segments.append(current)
+            current = ""
+        current = f"{current}\n\n{para}" if current else para
+    if current.strip():
+        segments.append(current)
+    return [s for s in segments if s.strip()]
+
+
+# ============================================================
+# Tags
+# ============================================================
+STOPWORDS = set("""
+a an and are as at be but by for if in into is it no not of on or such that the
+their then there these they this to was were will with you your from
+""".split())
+
+
+def extract_tags(text: str, entities: list, noun_chunks: list[str], k: int = 20) -> list[str]:
+    tags = set()
+
+    # Named entities
+    for e in entities:
+        t = e.get("text")
+        if t:
+            tags.add(t)
+
+    # Noun chunks
+    for nc in noun_chunks:
+        t = re.sub(r"[^A-Za-z0-9\- ]+", "", nc).strip()
+        if t and t.lower() not in STOPWORDS:
+            tags.add(t)
+
+    # Frequent words
+    words = [w.lower() for w in re.findall(r"[A-Za-z0-9\-]{3,}", text)]
+    words = [w for w in words if w not in STOPWORDS]
+    freq = Counter(words).most_common(k)
+
+    for w, _ in freq:
+        tags.add(w)
+
+    return list(tags)[:50]
+
+
+# ============================================================
+# Single-pass analysis
+# ============================================================
+def analyze(text: str) -> dict:
+    """
+    Parses the text once (segment by segment through nlp.pipe) and reuses
+    each Doc for both entities and noun chunks.
+    Returns entities, tags and per-stage timings in ms.
+    """
+    start = time.perf_counter()
+    segments = split_segments(text)
+    segmented = time.perf_counter()
+
+    entities, noun_chunks = [], []
+    for doc in NLP.pipe(segments, batch_size=NLP_BATCH_SIZE, n_process=NLP_PROCESSES):
+        entities.extend({"text": e.text, "label": e.label_} for e in doc.ents)
+        noun_chunks.extend(nc.text for nc in doc.noun_chunks)
+    parsed = time.perf_counter()
+
+    tags = extract_tags(text, entities, noun_chunks)
+    done = time.perf_counter()
+
+    return {
+        "entities": entities,
+        "tags": tags,
+        "timings": {
+            "segments": len(segments),
+            "segment_ms": round((segmented - start) * 1000),
+            "parse_ms": round((parsed - segmented) * 1000),
+            "tags_ms": round((done - parsed) * 1000),
+        },
+    }
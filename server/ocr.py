@@ -0,0 +1,172 @@
+import os
+import subprocess
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Tesseract's own OpenMP threading fights with page-level parallelism
+os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+import pytesseract
+from PIL import Image, ImageSequence
+
+from preprocess import OCR_PREPROCESS, preprocess
+
+OCR_DPI = int(os.environ.get("OCR_DPI", "200"))
+# Page threads per task. Celery runs OCR_WORKER_CONCURRENCY tasks per
+# worker (celeryconfig.py), so split the cores between them: tasks x
+# threads ~ cores, instead of cores^2 tesseract processes and 2*cores^2
+# rendered pages in flight. Fanned-out page ranges are separate tasks
+# and share the same budget.
+OCR_WORKER_CONCURRENCY = int(os.environ.get("OCR_WORKER_CONCURRENCY", "2"))
+OCR_WORKERS = int(os.environ.get(
+    "OCR_WORKERS", str(max(1, (os.cpu_count() or 1) // OCR_WORKER_CONCURRENCY))
+))
+OCR_MAX_PAGES_IN_FLIGHT = int(os.environ.get("OCR_MAX_PAGES_IN_FLIGHT", str(OCR_WORKERS * 2)))
+# Where rendered pages are written; defaults to the system temp dir
+OCR_TMP_DIR = os.environ.get("OCR_TMP_DIR") or None
+# Born-digital pages: use the embedded text layer when it has enough text
+OCR_TEXT_LAYER = os.environ.get("OCR_TEXT_LAYER", "1") == "1"
+OCR_TEXT_LAYER_MIN_CHARS = int(os.environ.get("OCR_TEXT_LAYER_MIN_CHARS", "50"))
+
+
+# ============================================================
+# PDF
+# ============================================================
+def pdf_page_count(path: str) -> int:
+    return int(pdfinfo_from_path(path)["Pages"])
+
+
+def extract_text_layer(path: str, page: int) -> str:
+    """Reads a page's embedded text with poppler's pdftotext (no rendering)."""
+    out = subprocess.run(
+        ["pdftotext", "-f", str(page), "-l", str(page), "-layout", "-enc", "UTF-8", path, "-"],
+        capture_output=True, timeout=60,
+    )
+    return out.stdout.decode("utf-8", errors="ignore") if out.returncode == 0 else ""
+
+
+def ocr_pdf_page(path: str, page: int) -> dict:
+    """
+    Extracts one page's text, choosing the path per page:
+
+    - "text_layer": the page already carries at least
+      OCR_TEXT_LAYER_MIN_CHARS characters of embedded text.
+    - "ocr": image-only page; rasterize and run Tesseract.
+
+    Rasterizing and OCR both run in child processes (pdftoppm, tesseract),
+    so threads calling this scale across cores. The page is rendered to a
+    temporary file that tesseract reads directly, so the bitmap never
+    enters this process and is deleted right after OCR. Peak memory stays
+    flat regardless of page count.
+    """
+    start = time.perf_counter()
+    result = {"page": page, "text": "", "method": "ocr", "text_ms": 0, "render_ms": 0, "ocr_ms": 0}
+
+    if OCR_TEXT_LAYER:
+        text = extract_text_layer(path, page)
+        result["text_ms"] = round((time.perf_counter() - start) * 1000)
+        if len("".join(text.split())) >= OCR_TEXT_LAYER_MIN_CHARS:
+            result.update(text=text, method="text_layer")
+            return result
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="ocr_page_", dir=OCR_TMP_DIR) as td:
+        images = convert_from_path(
+            path, dpi=OCR_DPI, first_page=page, last_page=page,
+            output_folder=td, paths_only=True,
+        )
+        rendered = time.perf_counter()
+        text = pytesseract.image_to_string(images[0]) if images else ""
+    done = time.perf_counter()
+
+    result.update(
+        text=text,
+        render_ms=round((rendered - start) * 1000),
+        ocr_ms=round((done - rendered) * 1000),
+    )
+    return result
+
+
+def ocr_pdf_pages(path: str, first_page: int = 1, last_page: int | None = None):
+    """
+    Yields per-page results in page order while OCR runs on a pool of
+    OCR_WORKERS. At most OCR_MAX_PAGES_IN_FLIGHT pages are rendered or
+    waiting to be consumed at any time.
+
+    Celery prefork children are daemonic and cannot start a process pool,
+    but the heavy lifting already happens in pdftoppm/tesseract child
+    processes, so a thread pool driving them gives the same parallelism.
+    """
+    if last_page is None:
+        last_page = pdf_page_count(path)
+
+    pages = iter(range(first_page, last_page + 1))
+    in_flight = deque()
+
+    with ThreadPoolExecutor(max_workers=OCR_WORKERS) as pool:
+        def submit_next() -> bool:
+            page = next(pages, None)
+            if page is None:
+                return False
+            in_flight.append(pool.submit(ocr_pdf_page, path, page))
+            return True
+
+        while len(in_flight) < OCR_MAX_PAGES_IN_FLIGHT and submit_next():
+            pass
+
+        while in_flight:
+            result = in_flight.popleft().result()
+            submit_next()
+            yield result
+
+
+def extract_text_from_pdf(path: str) -> str:
+    return "\n".join(p["text"] for p in ocr_pdf_pages(path))
+
+
+# ============================================================
+# Images / type detection
+# ============================================================
+def ocr_image_frames(path: str):
+    """
+    Yields one result per image frame (multi-page TIFFs have several),
+    preprocessed for Tesseract unless OCR_PREPROCESS=0.
+    """
+    with Image.open(path) as img:
+        for n, frame in enumerate(ImageSequence.Iterator(img), start=1):
+            start = time.perf_counter()
+            dpi = None
+            if OCR_PREPROCESS:
+                frame, dpi = preprocess(frame)
+            else:
+                frame = frame.copy()
+            # Only a known DPI is passed; otherwise Tesseract estimates it
+            config = f"--dpi {dpi}" if dpi else ""
+            prepared = time.perf_counter()
+            text = pytesseract.image_to_string(frame, config=config)
+            done = time.perf_counter()
+            yield {
+                "page": n,
+                "text": text,
+                "method": "ocr",
+                "preprocess_ms": round((prepared - start) * 1000),
+                "ocr_ms": round((done - prepared) * 1000),
+            }
+
+
+def extract_text_from_image(path: str) -> str:
+    return "\n".join(f["text"] for f in ocr_image_frames(path))
+
+
+def detect_type(path: str) -> str:
+    lower = path.lower()
+    if lower.endswith(".pdf"):
+        return "pdf"
+    if lower.endswith((".png", ".jpg", ".jpeg", ".tif", ".tiff")):
+        return "image"
+    if lower.endswith((".txt", ".text")):
+        return "text"
+    return "other"
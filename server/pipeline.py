@@ -0,0 +1,117 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+_DONE = object()
+
+
+class _Aborted(Exception):
+    pass
+
+
+class Pipeline:
+    """
+    Runs each stage on its own thread, connected to the next one by a
+    bounded queue. Items put() into the pipeline flow through the stages in
+    order; a full queue blocks the stage (or producer) in front of it, so a
+    slow stage throttles the others instead of letting work pile up in
+    memory. The first error raised by a stage aborts the pipeline and is
+    re-raised in the producer.
+
+    A stage given as (fn, workers) processes up to `workers` items at
+    once (for I/O-bound stages such as API calls); its results are still
+    passed on in input order.
+
+        with Pipeline([(embed_batch, 4), upsert_batch]) as pipe:
+            for batch in batches:
+                pipe.put(batch)
+    """
+
+    def __init__(self, stages: list, queue_size: int = 4):
+        stages = [stage if isinstance(stage, tuple) else (stage, 1) for stage in stages]
+        self.queues = [queue.Queue(queue_size) for _ in stages]
+        self.abort = threading.Event()
+        self.error = None
+        self.threads = [
+            threading.Thread(target=self._run, args=(i, fn, workers), daemon=True)
+            for i, (fn, workers) in enumerate(stages)
+        ]
+
+    def __enter__(self):
+        for t in self.threads:
+            t.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            try:
+                self._put(self.queues[0], _DONE)
+            except _Aborted:
+                pass
+        else:
+            self.abort.set()
+
+        for t in self.threads:
+            t.join()
+        if exc_type is None and self.error is not None:
+            raise self.error
+        return False
+
+    def put(self, item):
+        try:
+            self._put(self.queues[0], item)
+        except _Aborted:
+            raise self.error
+
+    def _put(self, q: queue.Queue, item):
+        while True:
+            if self.abort.is_set():
+                raise _Aborted
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _get(self, q: queue.Queue):
+        while True:
+            if self.abort.is_set():
+                raise _Aborted
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _run(self, index: int, fn: Callable[[Any], Any], workers: int):
+        inbox = self.queues[index]
+        outbox = self.queues[index + 1] if index + 1 < len(self.queues) else None
+
+        def emit(result):
+            if outbox is not None:
+                self._put(outbox, result)
+
+        pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+        # Futures in submission order, at most `workers` in flight
+        pending = deque()
+        try:
+            while (item := self._get(inbox)) is not _DONE:
+                if pool is None:
+                    emit(fn(item))
+                    continue
+                pending.append(pool.submit(fn, item))
+                if len(pending) >= workers:
+                    emit(pending.popleft().result())
+            while pending:
+                emit(pending.popleft().result())
+            emit(_DONE)
+        except _Aborted:
+            pass
+        except Exception as e:
+            if self.error is None:
+                self.error = e
+            self.abort.set()
+        finally:
+            if pool is not None:
+                pool.shutdown(cancel_futures=True)
@@ -0,0 +1,90 @@
+import os
+import numpy as np
+from PIL import Image, ImageOps
+
+OCR_PREPROCESS = os.environ.get("OCR_PREPROCESS", "1") == "1"
+OCR_TARGET_DPI = int(os.environ.get("OCR_TARGET_DPI", "300"))
+# Images without DPI metadata (phone photos) are capped on their long side;
+# 3500px is roughly A4/Letter at 300 DPI
+OCR_MAX_SIDE = int(os.environ.get("OCR_MAX_SIDE", "3500"))
+OCR_BINARIZE = os.environ.get("OCR_BINARIZE", "1") == "1"
+OCR_DESKEW = os.environ.get("OCR_DESKEW", "1") == "1"
+OCR_DESKEW_MAX_ANGLE = float(os.environ.get("OCR_DESKEW_MAX_ANGLE", "5"))
+
+
+def downscale(img: Image.Image) -> tuple[Image.Image, int | None]:
+    """
+    Shrinks to OCR_TARGET_DPI (or OCR_MAX_SIDE when DPI is unknown).
+    Returns the image and its resulting DPI, None when unknown.
+    """
+    dpi = img.info.get("dpi", (0, 0))[0]
+    if dpi and dpi > OCR_TARGET_DPI:
+        scale = OCR_TARGET_DPI / dpi
+    else:
+        scale = min(1.0, OCR_MAX_SIDE / max(img.size))
+    effective_dpi = round(dpi * min(scale, 1.0)) if dpi else None
+    if scale >= 1.0:
+        return img, effective_dpi
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    return img.resize(size, Image.LANCZOS), effective_dpi
+
+
+def otsu_threshold(gray: np.ndarray) -> int:
+    """Otsu threshold (ink is <= threshold), fully vectorized over the histogram."""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    w0 = np.cumsum(hist)
+    w1 = w0[-1] - w0
+    m0 = np.cumsum(hist * levels)
+    mean0 = np.divide(m0, w0, out=np.zeros(256), where=w0 > 0)
+    mean1 = np.divide(m0[-1] - m0, w1, out=np.zeros(256), where=w1 > 0)
+    return int(np.argmax(w0 * w1 * (mean0 - mean1) ** 2))
+
+
+def estimate_skew(ink: np.ndarray, max_angle: float = OCR_DESKEW_MAX_ANGLE) -> float:
+    """
+    Projection-profile skew estimate: returns the counter-clockwise
+    rotation in degrees that straightens the text. Ink pixel rows are
+    sheared for each candidate angle and the angle whose row histogram
+    is sharpest (text lines aligned) wins.
+    """
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 100:
+        return 0.0
+
+    def best(angles: np.ndarray) -> float:
+        tans = np.tan(np.radians(angles))
+        scores = []
+        for t in tans:
+            rows = np.round(ys - xs * t).astype(np.int64)
+            counts = np.bincount(rows - rows.min())
+            scores.append(np.dot(counts, counts))
+        return float(angles[int(np.argmax(scores))])
+
+    coarse = best(np.arange(-max_angle, max_angle + 0.5, 0.5))
+    return round(best(np.arange(coarse - 0.5, coarse + 0.55, 0.1)), 1)
+
+
+def preprocess(img: Image.Image) -> tuple[Image.Image, int | None]:
+    """
+    Downscale, grayscale, deskew and binarize one page image for OCR.
+    Returns the image and its DPI (None when the source had no DPI).
+    """
+    img, dpi = downscale(ImageOps.exif_transpose(img))
+    gray = np.asarray(img.convert("L"), dtype=np.uint8)
+    threshold = otsu_threshold(gray)
+
+    if OCR_DESKEW:
+        # Estimate on a ~1000px copy; skew angle is scale-invariant
+        step = max(1, max(gray.shape) // 1000)
+        angle = estimate_skew(gray[::step, ::step] <= threshold)
+        if abs(angle) > 0.1:
+            rotated = Image.fromarray(gray).rotate(
+                angle, resample=Image.BICUBIC, expand=True, fillcolor=255
+            )
+            gray = np.asarray(rotated, dtype=np.uint8)
+
+    if OCR_BINARIZE:
+        gray = np.where(gray <= threshold, 0, 255).astype(np.uint8)
+
+    return Image.fromarray(gray), dpi
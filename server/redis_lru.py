@@ -0,0 +1,58 @@
+import time
+import redis
+
+
+class RedisLRU:
+    """
+    Size and usage bookkeeping shared by the Redis caches: a sorted set
+    of entry keys scored by last use, and a hash of counters. Owners write
+    and expire the entries themselves; whenever the set grows past
+    `max_entries` the least recently used entries are deleted.
+    """
+
+    def __init__(self, r: redis.Redis, prefix: str, ttl: int, max_entries: int):
+        self.r = r
+        self.lru_key = f"{prefix}lru"
+        self.stats_key = f"{prefix}stats"
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    def touch(self, pipe, keys):
+        """Queues a last-used update for keys on pipe."""
+        if keys:
+            pipe.zadd(self.lru_key, dict.fromkeys(keys, time.time()))
+
+    def count(self, pipe, **counters):
+        """Queues counter increments (e.g. hits=3) on pipe."""
+        for field, n in counters.items():
+            if n:
+                pipe.hincrby(self.stats_key, field, n)
+
+    def add(self, pipe, keys):
+        """Records new entries, runs pipe and trims; returns pipe's results."""
+        self.touch(pipe, keys)
+        pipe.zcard(self.lru_key)
+        results = pipe.execute()
+        if results[-1] > self.max_entries:
+            self.evict(results[-1] - self.max_entries)
+        return results[:-1]
+
+    def evict(self, count: int):
+        # Drop the least recently used entries (plus any already expired)
+        victims = self.r.zrange(self.lru_key, 0, count - 1)
+        if victims:
+            pipe = self.r.pipeline(transaction=False)
+            pipe.delete(*victims)
+            pipe.zrem(self.lru_key, *victims)
+            pipe.hincrby(self.stats_key, "evictions", len(victims))
+            pipe.execute()
+        self.r.zremrangebyscore(self.lru_key, 0, time.time() - self.ttl)
+
+    def counters(self) -> dict:
+        """All counters plus the current number of entries."""
+        raw = {k.decode(): int(v) for k, v in self.r.hgetall(self.stats_key).items()}
+        return {"evictions": 0, **raw, "entries": self.r.zcard(self.lru_key)}
+
+
+def hit_rate(hits: int, lookups: int) -> float:
+    return round(hits / lookups, 4) if lookups else 0.0
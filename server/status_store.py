@@ -5,41 +5,130 @@ import redis
 import os
 
 STATUS_PREFIX = "job:"
+PAGES_SUFFIX = ":pages"
+# Every update is published here so the API can push it to clients
+CHANNEL_PREFIX = "jobstatus:"
+TERMINAL_STATUSES = ("COMPLETED", "FAILED")
+
+# Seconds to keep job hashes; 0 disables expiry. Active jobs get a long
+# safety-net TTL, finished jobs a shorter one.
+STATUS_TTL_ACTIVE = int(os.environ.get("STATUS_TTL_ACTIVE", 7 * 86400))
+STATUS_TTL_TERMINAL = int(os.environ.get("STATUS_TTL_TERMINAL", 3 * 86400))
+
+# Monotonic-progress write + TTL + publish in a single atomic round trip.
+# KEYS: job hash, pages hash
+# ARGV: channel, job id, active ttl, terminal ttl, field1, value1, ...
+UPDATE_SCRIPT = """
+local payload = {id = ARGV[2]}
+local mapping = {}
+for i = 5, #ARGV, 2 do
+  local k, v = ARGV[i], ARGV[i + 1]
+  if k == 'progress' then
+    local current = tonumber(redis.call('HGET', KEYS[1], 'progress')) or 0
+    if current > (tonumber(v) or 0) then v = tostring(current) end
+  end
+  mapping[#mapping + 1] = k
+  mapping[#mapping + 1] = v
+  payload[k] = v
+end
+redis.call('HSET', KEYS[1], unpack(mapping))
+
+local status = redis.call('HGET', KEYS[1], 'status')
+local ttl = tonumber(ARGV[3])
+if status == 'COMPLETED' or status == 'FAILED' then ttl = tonumber(ARGV[4]) end
+if ttl > 0 then
+  redis.call('EXPIRE', KEYS[1], ttl)
+  redis.call('EXPIRE', KEYS[2], ttl)
+end
+
+redis.call('PUBLISH', ARGV[1], cjson.encode(payload))
+"""
+
 
 class StatusStore:
     def __init__(self, url: str | None = None):
         self.r = redis.Redis.from_url(url or os.environ.get("REDIS_URL"))
+        self._update = self.r.register_script(UPDATE_SCRIPT)
 
-    def new_job(self, filename: str) -> str:
-        job_id = str(uuid.uuid4())
-        data = {
-            "id": job_id,
-            "filename": filename,
-            "status": "RECEIVED",
-            "progress": 10,
-            "stage": "Upload requested",
-            "created_at": int(time.time()),
-        }
-        self.r.hset(STATUS_PREFIX + job_id, mapping=data)
-        # Optional: expire after 24h
-        # self.r.expire(STATUS_PREFIX + job_id, 86400)
-        return job_id
+    def new_job(self, filename: str, tenant: str = "default") -> str:
+        return self.new_jobs([filename], tenant)[0]
+
+    def new_jobs(self, filenames: list[str], tenant: str = "default") -> list[str]:
+        """Creates one status hash per file in a single round trip."""
+        now = int(time.time())
+        job_ids = [str(uuid.uuid4()) for _ in filenames]
+        pipe = self.r.pipeline()
+        for job_id, filename in zip(job_ids, filenames):
+            data = {
+                "id": job_id,
+                "filename": filename,
+                "tenant": tenant,
+                "status": "RECEIVED",
+                "progress": 10,
+                "stage": "Upload requested",
+                "created_at": now,
+            }
+            pipe.hset(STATUS_PREFIX + job_id, mapping=data)
+            if STATUS_TTL_ACTIVE:
+                pipe.expire(STATUS_PREFIX + job_id, STATUS_TTL_ACTIVE)
+        pipe.execute()
+        return job_ids
 
     def update(self, job_id: str, **fields):
-        # Ensure progress never decreases
-        if "progress" in fields:
-            current = int(self.get(job_id).get("progress", 0) or 0)
-            fields["progress"] = max(int(fields["progress"]), current)
+        """
+        Writes fields atomically in one round trip: progress never
+        decreases (even with concurrent writers), the hash TTL is refreshed
+        (shorter once the job is terminal) and the change is published.
+        """
+        if fields:
+            self._update(*self._update_args(job_id, fields))
 
+    def update_many(self, updates: dict[str, dict]):
+        """update() for several jobs, pipelined into one round trip."""
+        pipe = self.r.pipeline(transaction=False)
+        for job_id, fields in updates.items():
+            if fields:
+                self._update(*self._update_args(job_id, fields), client=pipe)
+        pipe.execute()
+
+    def _update_args(self, job_id: str, fields: dict) -> tuple[list, list]:
         # Auto-set completion timestamp
         if fields.get("status") == "COMPLETED":
             fields["completed_at"] = int(time.time())
 
-        self.r.hset(
-            STATUS_PREFIX + job_id,
-            mapping={k: str(v) for k, v in fields.items()}
-        )
+        args = [CHANNEL_PREFIX + job_id, job_id, STATUS_TTL_ACTIVE, STATUS_TTL_TERMINAL]
+        for k, v in fields.items():
+            args += [k, str(v)]
+        return [STATUS_PREFIX + job_id, STATUS_PREFIX + job_id + PAGES_SUFFIX], args
+
+    def incr(self, job_id: str, field: str, amount: int = 1) -> int:
+        """Atomically increments a numeric field and returns the new value."""
+        return self.r.hincrby(STATUS_PREFIX + job_id, field, amount)
 
     def get(self, job_id: str) -> dict:
         raw = self.r.hgetall(STATUS_PREFIX + job_id)
         return {k.decode(): v.decode() for k, v in raw.items()} if raw else {}
+
+    def get_many(self, job_ids: list[str]) -> dict:
+        """Fetches several jobs in one round trip; unknown ids map to {}."""
+        pipe = self.r.pipeline(transaction=False)
+        for job_id in job_ids:
+            pipe.hgetall(STATUS_PREFIX + job_id)
+        return {
+            job_id: {k.decode(): v.decode() for k, v in raw.items()}
+            for job_id, raw in zip(job_ids, pipe.execute())
+        }
+
+    def subscribe(self, job_ids: list[str]):
+        """Returns a PubSub receiving the update events of the given jobs."""
+        pubsub = self.r.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(*[CHANNEL_PREFIX + job_id for job_id in job_ids])
+        return pubsub
+
+    def record_page(self, job_id: str, page: int, **info):
+        """Stores per-page processing details (timings, OCR path, ...)."""
+        self.r.hset(STATUS_PREFIX + job_id + PAGES_SUFFIX, str(page), json.dumps(info))
+
+    def get_pages(self, job_id: str) -> dict:
+        raw = self.r.hgetall(STATUS_PREFIX + job_id + PAGES_SUFFIX)
+        return {int(k): json.loads(v) for k, v in raw.items()}
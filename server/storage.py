@@ -1,10 +1,21 @@
 import os
+import hashlib
 from google.cloud import storage
 from datetime import timedelta
 
+from ttl_cache import TTLCache
+
 # Bucket name from environment variable
 BUCKET = os.environ.get("GCS_BUCKET")
 
+# Resumable upload chunk size; GCS requires a multiple of 256 KiB
+UPLOAD_CHUNK_SIZE = int(os.environ.get("UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+
+# Signed URLs are minted with this lifetime and reused while they still
+# have at least the lifetime the caller asked for
+SIGNED_URL_TTL_MINUTES = int(os.environ.get("SIGNED_URL_TTL_MINUTES", 60))
+signed_url_cache = TTLCache(int(os.environ.get("SIGNED_URL_CACHE_SIZE", 10000)))
+
 _client = None
 
 
@@ -18,6 +29,36 @@ def client():
     return _client
 
 
+class HashingReader:
+    """
+    Read-only file wrapper that computes a sha256 of the bytes as they
+    stream through. Re-reads after a seek (upload retries) are not
+    hashed twice.
+    """
+
+    def __init__(self, fileobj):
+        self.f = fileobj
+        self.sha = hashlib.sha256()
+        self.hashed = 0
+
+    def read(self, size: int = -1) -> bytes:
+        pos = self.f.tell()
+        data = self.f.read(size)
+        if pos <= self.hashed < pos + len(data):
+            self.sha.update(data[self.hashed - pos:])
+            self.hashed = pos + len(data)
+        return data
+
+    def tell(self) -> int:
+        return self.f.tell()
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self.f.seek(offset, whence)
+
+    def hexdigest(self) -> str:
+        return self.sha.hexdigest()
+
+
 def upload_file(fileobj, dest_path: str, content_type: str | None = None) -> str:
     """
     Uploads a file object to Google Cloud Storage.
@@ -33,6 +74,56 @@ def upload_file(fileobj, dest_path: str, content_type: str | None = None) -> str
     return f"gs://{BUCKET}/{dest_path}"
 
 
+def stream_upload(stream, dest_path: str, content_type: str | None = None) -> tuple[str, str, int]:
+    """
+    Pipes a stream to GCS through a resumable upload session, reading and
+    sending UPLOAD_CHUNK_SIZE bytes at a time, so memory stays bounded no
+    matter the object size. Returns (gs:// URI, sha256 hex, size).
+    """
+    blob = client().bucket(BUCKET).blob(dest_path)
+    sha = hashlib.sha256()
+    size = 0
+
+    with blob.open("wb", chunk_size=UPLOAD_CHUNK_SIZE, content_type=content_type,
+                   ignore_flush=True) as writer:
+        while True:
+            data = stream.read(UPLOAD_CHUNK_SIZE)
+            if not data:
+                break
+            sha.update(data)
+            size += len(data)
+            writer.write(data)
+
+    return f"gs://{BUCKET}/{dest_path}", sha.hexdigest(), size
+
+
+def create_upload_session(dest_path: str, content_type: str | None = None,
+                          size: int | None = None, origin: str | None = None) -> tuple[str, str]:
+    """
+    Starts a resumable upload session the client can upload to directly.
+    Returns (session URL, gs:// URI).
+    """
+    blob = client().bucket(BUCKET).blob(dest_path)
+    url = blob.create_resumable_upload_session(
+        content_type=content_type, size=size, origin=origin
+    )
+    return url, f"gs://{BUCKET}/{dest_path}"
+
+
+def object_exists(gcs_uri: str) -> bool:
+    _, rest = gcs_uri.split("gs://", 1)
+    bucket_name, blob_name = rest.split("/", 1)
+    return client().bucket(bucket_name).blob(blob_name).exists()
+
+
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
 def download_to_path(gcs_uri: str, local_path: str):
     """
     Downloads a GCS file to a local path.
@@ -49,16 +140,24 @@ def download_to_path(gcs_uri: str, local_path: str):
     blob.download_to_filename(local_path)
 
 
-def generate_signed_url(gcs_uri: str, minutes: int = 15) -> str:
+def generate_signed_url(gcs_uri: str, minutes: int = 15, method: str = "GET") -> str:
     """
     Generates a V4 signed URL for secure access to a private GCS object.
     This version fixes:
     - PDF.js loading errors
     - Signature corruption (%253D)
     - Browser iframe encoding issues
+
+    URLs are cached per (gcs_uri, method) and a cached URL is returned
+    while it remains valid for at least `minutes`.
     """
     assert gcs_uri.startswith("gs://"), "Invalid GCS URI"
 
+    key = (gcs_uri, method)
+    url = signed_url_cache.get(key, min_remaining=minutes * 60)
+    if url:
+        return url
+
     # Extract bucket + blob path
     _, rest = gcs_uri.split("gs://", 1)
     bucket_name, blob_name = rest.split("/", 1)
@@ -67,10 +166,12 @@ def generate_signed_url(gcs_uri: str, minutes: int = 15) -> str:
     blob = bucket.blob(blob_name)
 
     # ⭐ Use V4 signing – required for iframe/pdf.js and modern GCS auth
+    lifetime = max(minutes, SIGNED_URL_TTL_MINUTES)
     url = blob.generate_signed_url(
         version="v4",
-        expiration=timedelta(minutes=minutes),
-        method="GET",
+        expiration=timedelta(minutes=lifetime),
+        method=method,
     )
 
+    signed_url_cache.set(key, url, ttl=lifetime * 60)
     return url
@@ -1,235 +1,357 @@
 import os
-import json
-import re
 import tempfile
-import uuid
-from collections import Counter
+import time
+from contextlib import contextmanager
 
-from celery import Celery
-import spacy
-from pdf2image import convert_from_path
-import pytesseract
-from PIL import Image
+from celery import Celery, chord
+from sqlalchemy import update
 
-from storage import download_to_path
+from nlp import analyze
+from ocr import ocr_pdf_pages, pdf_page_count, ocr_image_frames, detect_type
+from storage import download_to_path, file_sha256
 from status_store import StatusStore
+from tenant_limits import TenantLimiter, DEFAULT_TENANT
+from pipeline import Pipeline
+from chunking import chunk_pages
 from db import get_session
 from models import Document
 
 # ------------- OpenAI -------------
-from openai import OpenAI
-client = OpenAI()
-EMBEDDING_MODEL = "text-embedding-3-small"  # 1536 dims
+from embeddings import embed_many, BATCH_SIZE as EMBED_BATCH_SIZE, CONCURRENCY as EMBED_CONCURRENCY
+from answer_cache import cache as answer_cache
 
 # ------------- Qdrant -------------
-from qdrant_client import QdrantClient
-from qdrant_client.models import (
-    PointStruct,
-    Distance,
-    VectorParams
-)
+import vector_store
 
-# ---- FIXED: Use same collection everywhere ----
-QDRANT_COLLECTION = "ocr_documents"
+# Celery
+celery_app = Celery("smart-ocr")
+celery_app.config_from_object("celeryconfig")
 
-QDRANT_URL = os.environ.get("QDRANT_URL", "http://qdrant:6333")
-qclient = QdrantClient(url=QDRANT_URL)
+STATUS = StatusStore()
+LIMITER = TenantLimiter()
 
+# Interactive uploads and bulk backfills are separate queues, so a backlog
+# of archived scans never sits in front of a user's upload. Continuations
+# of a started job (page ranges, NLP, indexing) outrank new jobs in the
+# same queue so in-flight work finishes first (lower = sooner).
+OCR_QUEUE = os.environ.get("OCR_QUEUE", "ocr")
+OCR_BULK_QUEUE = os.environ.get("OCR_BULK_QUEUE", "ocr_bulk")
+LANES = {
+    "interactive": {"queue": OCR_QUEUE, "priority": 2},
+    "bulk": {"queue": OCR_BULK_QUEUE, "priority": 6},
+}
 
-# ===== Ensure Qdrant collection exists =====
-def ensure_qdrant_collection():
-    try:
-        collections = qclient.get_collections().collections
-        if any(c.name == QDRANT_COLLECTION for c in collections):
-            print(f"✓ Qdrant collection '{QDRANT_COLLECTION}' already exists")
-            return
-
-        print(f"Creating Qdrant collection '{QDRANT_COLLECTION}'...")
-        qclient.create_collection(
-            collection_name=QDRANT_COLLECTION,
-            vectors_config=VectorParams(size=1536, distance=Distance.COSINE),
-        )
-        print(f"✓ Created Qdrant collection '{QDRANT_COLLECTION}'")
+# PDFs longer than this are split into page-range subtasks
+OCR_FANOUT_PAGES = int(os.environ.get("OCR_FANOUT_PAGES", "40"))
+OCR_PAGES_PER_TASK = int(os.environ.get("OCR_PAGES_PER_TASK", "20"))
 
-    except Exception as e:
-        if "already exists" in str(e):
-            print(f"✓ Collection '{QDRANT_COLLECTION}' already exists")
-        else:
-            raise
+# Progress bands: OCR pages fill 45-75, then NLP, indexing, done
+OCR_PROGRESS_START, OCR_PROGRESS_END = 45, 75
 
+# Chunks embedded + upserted together (one embeddings request at the
+# default size), and batches buffered between stages. Up to
+# EMBED_CONCURRENCY batches are embedded at once.
+PIPELINE_BATCH_CHUNKS = int(os.environ.get("PIPELINE_BATCH_CHUNKS", EMBED_BATCH_SIZE))
+PIPELINE_QUEUE_SIZE = int(os.environ.get("PIPELINE_QUEUE_SIZE", "4"))
 
-ensure_qdrant_collection()
 
-# Celery
-celery_app = Celery("smart-ocr")
-celery_app.config_from_object("celeryconfig")
+# ============================================================
+# Helper: queues and tenant slots
+# ============================================================
+def lane_options(lane: str, continuation: bool = False) -> dict:
+    """apply_async options (queue, priority) for a job lane."""
+    options = dict(LANES.get(lane, LANES["interactive"]))
+    if continuation:
+        options["priority"] = max(options["priority"] - 2, 0)
+    return options
+
+
+def publish_jobs(jobs: list[dict], producer=None):
+    """Sends jobs admitted by the tenant limiter (see TenantLimiter) to their lane."""
+    if not jobs:
+        return
+    STATUS.update_many({job["job_id"]: {"stage": "Queued"} for job in jobs})
+    with celery_app.producer_or_acquire(producer) as producer:
+        for job in jobs:
+            process_document.apply_async(
+                (job["job_id"], job["gcs_uri"], job["filename"]),
+                {"lane": job["lane"], "tenant": job["tenant"]},
+                producer=producer,
+                **lane_options(job["lane"])
+            )
 
-STATUS = StatusStore()
-NLP = spacy.load("en_core_web_sm")
+
+def release_slot(job_id: str):
+    """Frees the job's tenant slot and publishes the jobs waiting for it."""
+    data = STATUS.get(job_id)
+    tenant = data.get("tenant", DEFAULT_TENANT)
+    lane = data.get("lane", "interactive")
+    publish_jobs(LIMITER.release(tenant, lane, job_id))
 
 
 # ============================================================
-# Helper: OpenAI Embedding
+# Helper: PDF OCR with per-page progress
 # ============================================================
-def embed(text: str) -> list[float]:
-    clean = text.strip()
-    if not clean:
-        return [0.0] * 1536
+@contextmanager
+def fail_job_on_error(job_id: str):
+    try:
+        yield
+    except Exception as e:
+        STATUS.update(job_id, status="FAILED", stage=str(e))
+        with get_session() as s:
+            s.execute(update(Document).where(Document.id == job_id).values(status="FAILED"))
+            s.commit()
+        release_slot(job_id)
+        raise
+
 
-    resp = client.embeddings.create(
-        model=EMBEDDING_MODEL,
-        input=clean[:8000]
-    )
-    return resp.data[0].embedding
+def iter_page_range(job_id: str, path: str, first: int, last: int, total: int):
+    """
+    OCRs pages [first, last], yielding (page, text) in order. The path used
+    per page (text_layer / ocr) is recorded in the job status. Each finished
+    page bumps the job's shared pages_done counter, so progress reflects
+    real completion even when ranges run on different workers.
+    """
+    for page in ocr_pdf_pages(path, first, last):
+        STATUS.record_page(
+            job_id, page["page"],
+            method=page["method"], text_ms=page["text_ms"],
+            render_ms=page["render_ms"], ocr_ms=page["ocr_ms"], chars=len(page["text"])
+        )
+        STATUS.incr(job_id, f"pages_{page['method']}")
+        done = STATUS.incr(job_id, "pages_done")
+        progress = OCR_PROGRESS_START + (OCR_PROGRESS_END - OCR_PROGRESS_START) * done // total
+        STATUS.update(job_id, progress=progress, stage=f"OCR page {done}/{total}")
+        yield page["page"], page["text"]
 
 
-# ============================================================
-# Helper: OCR
-# ============================================================
-def extract_text_from_pdf(path: str) -> str:
-    pages = convert_from_path(path, dpi=200)
-    text_pages = [pytesseract.image_to_string(img) for img in pages]
-    return "\n".join(text_pages)
+def ocr_page_range(job_id: str, path: str, first: int, last: int, total: int) -> list:
+    return [[page, text] for page, text in iter_page_range(job_id, path, first, last, total)]
 
 
-def extract_text_from_image(path: str) -> str:
-    return pytesseract.image_to_string(Image.open(path))
+def iter_image_frames(job_id: str, path: str):
+    for frame in ocr_image_frames(path):
+        STATUS.record_page(
+            job_id, frame["page"], method=frame["method"],
+            preprocess_ms=frame["preprocess_ms"], ocr_ms=frame["ocr_ms"],
+            chars=len(frame["text"])
+        )
+        yield frame["page"], frame["text"]
+
+
+def record_content_hash(job_id: str, path: str):
+    """Direct-to-storage uploads arrive without a hash; compute it here."""
+    with get_session() as s:
+        d = s.get(Document, job_id)
+        if d and not d.content_hash:
+            d.content_hash = file_sha256(path)
+            s.commit()
+
+
+def merge_page_ranges(results: list) -> list:
+    return sorted((p for chunk in results for p in chunk), key=lambda p: p[0])
+
 
+def join_pages(pages: list) -> str:
+    return "\n".join(text for _, text in pages)
 
-def detect_type(path: str) -> str:
-    lower = path.lower()
-    if lower.endswith(".pdf"):
-        return "pdf"
-    if lower.endswith((".png", ".jpg", ".jpeg", ".tif", ".tiff")):
-        return "image"
-    if lower.endswith((".txt", ".text")):
-        return "text"
-    return "other"
+
+# ============================================================
+# Helper: streaming chunk -> embed -> upsert
+# ============================================================
+def indexing_pipeline(job_id: str, point_ids: list) -> Pipeline:
+    """
+    Embeds (EMBED_CONCURRENCY batches at a time) and upserts, in order,
+    batches of chunks (see chunking.Chunker) on background threads. Ids
+    of the points written are appended to point_ids. Tags are set once
+    NLP is done (see finish_document).
+    """
+    with get_session() as s:
+        d = s.get(Document, job_id)
+        created_at = int(d.created_at.timestamp()) if d and d.created_at else int(time.time())
+
+    def embed_batch(batch):
+        return batch, embed_many([chunk["text"] for chunk in batch])
+
+    def upsert_batch(item):
+        batch, vectors = item
+        payloads = [{**chunk, "created_at": created_at} for chunk in batch]
+        point_ids.extend(vector_store.upsert_chunks(job_id, payloads, vectors))
+        STATUS.update(job_id, chunks_indexed=len(point_ids))
+
+    return Pipeline([(embed_batch, EMBED_CONCURRENCY), upsert_batch], queue_size=PIPELINE_QUEUE_SIZE)
+
+
+def feed_chunks(pipe: Pipeline, chunks):
+    """Puts chunks into the pipeline in batches of PIPELINE_BATCH_CHUNKS."""
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) >= PIPELINE_BATCH_CHUNKS:
+            pipe.put(batch)
+            batch = []
+    if batch:
+        pipe.put(batch)
+
+
+def finish_document(job_id: str, analysis: dict, point_ids: list):
+    """Drops stale chunks, tags the new ones and persists the results."""
+    # Reprocessing: drop chunks from a previous run that no longer exist
+    vector_store.delete_document(job_id, keep_ids=point_ids)
+    # Tags go in every payload for corpus-wide filters
+    vector_store.set_document_payload(job_id, tags=analysis["tags"])
+    print(f"✓ Inserted {len(point_ids)} chunks for {job_id}")
+
+    with get_session() as s:
+        d = s.get(Document, job_id)
+        if d:
+            d.status = "COMPLETED"
+            d.text = join_pages(analysis["pages"])[:100000]
+            d.entities = analysis["entities"]
+            d.tags = analysis["tags"]
+            s.commit()
+
+    # New document version: cached chat answers no longer apply
+    if answer_cache():
+        answer_cache().invalidate(job_id)
+
+    STATUS.update(job_id, status="COMPLETED", progress=100, stage="Done")
+    release_slot(job_id)
 
 
 # ============================================================
-# Helper: Tags
+# Pipeline stages
 # ============================================================
-STOPWORDS = set("""
-a an and are as at be but by for if in into is it no not of on or such that the
-their then there these they this to was were will with you your from
-""".split())
+@celery_app.task(queue=OCR_QUEUE)
+def ocr_pages_task(job_id: str, gcs_uri: str, filename: str, first: int, last: int, total: int):
+    """OCR subtask for one page range of a large PDF; runs on any worker."""
+    with fail_job_on_error(job_id), tempfile.TemporaryDirectory() as td:
+        local_path = os.path.join(td, filename)
+        download_to_path(gcs_uri, local_path)
+        return ocr_page_range(job_id, local_path, first, last, total)
 
 
-def extract_tags(text: str, entities: list, k: int = 20) -> list[str]:
-    tags = set()
+@celery_app.task(queue=OCR_QUEUE)
+def collect_pages(results: list, job_id: str) -> list:
+    """Chord callback: stitches the page ranges back together in order."""
+    with fail_job_on_error(job_id):
+        return merge_page_ranges(results)
 
-    # Named entities
-    for e in entities:
-        t = e.get("text")
-        if t:
-            tags.add(t)
 
-    # Noun chunks
-    try:
-        doc = NLP(text)
-        for nc in doc.noun_chunks:
-            t = re.sub(r"[^A-Za-z0-9\- ]+", "", nc.text).strip()
-            if t and t.lower() not in STOPWORDS:
-                tags.add(t)
-    except:
-        pass
+@celery_app.task(queue=OCR_QUEUE)
+def analyze_document(pages: list, job_id: str) -> dict:
+    """NLP stage: entities and tags over the [page, text] pairs."""
+    with fail_job_on_error(job_id):
+        STATUS.update(job_id, status="NLP_IN_PROGRESS", progress=80, stage="Extracting entities")
 
-    # Frequent words
-    words = [w.lower() for w in re.findall(r"[A-Za-z0-9\-]{3,}", text)]
-    words = [w for w in words if w not in STOPWORDS]
-    freq = Counter(words).most_common(k)
+        result = analyze(join_pages(pages))
+        timings = result["timings"]
+        print(f"✓ NLP for {job_id}: {timings}")
+        STATUS.update(job_id, **{f"nlp_{k}": v for k, v in timings.items()})
 
-    for w, _ in freq:
-        tags.add(w)
+        return {"pages": pages, "entities": result["entities"], "tags": result["tags"]}
 
-    return list(tags)[:50]
 
+@celery_app.task(queue=OCR_QUEUE)
+def index_document(analysis: dict, job_id: str):
+    """Embedding stage for fanned-out PDFs: chunk, embed, upsert, persist."""
+    with fail_job_on_error(job_id):
+        STATUS.update(job_id, status="INDEXING", progress=90, stage="Embedding chunks")
 
-# ============================================================
-# Helper: Chunking
-# ============================================================
-def chunk_text(text: str, size: int = 500, overlap: int = 50) -> list[str]:
-    chunks = []
-    i = 0
-    n = len(text)
-    while i < n:
-        chunk = text[i:i+size]
-        chunks.append(chunk)
-        i += size - overlap
-    return chunks
+        point_ids = []
+        with indexing_pipeline(job_id, point_ids) as pipe:
+            feed_chunks(pipe, chunk_pages(analysis["pages"]))
+
+        finish_document(job_id, analysis, point_ids)
 
 
 # ============================================================
 # Main Worker
 # ============================================================
-@celery_app.task(queue="ocr")
-def process_document(job_id: str, gcs_uri: str, filename: str):
-    try:
-        STATUS.update(job_id, status="OCR_IN_PROGRESS", progress=60)
+@celery_app.task(queue=OCR_QUEUE)
+def process_document(job_id: str, gcs_uri: str, filename: str,
+                     lane: str = "interactive", tenant: str = DEFAULT_TENANT):
+    """
+    Entry point. Small files run every stage in this task, streamed: pages
+    are chunked as they are OCR'd while embedding and upserting run on
+    background threads, and NLP overlaps the last embedding batches.
+    PDFs with more than OCR_FANOUT_PAGES pages fan out into page-range OCR
+    subtasks whose chord callback continues with the NLP and embedding
+    stages.
+
+    Jobs are only published once the tenant limiter has given them a
+    slot, which is held until finish_document or a failure releases it.
+    """
+    LIMITER.touch(tenant, lane, job_id)
+
+    with fail_job_on_error(job_id):
+        STATUS.update(job_id, status="OCR_IN_PROGRESS", progress=OCR_PROGRESS_START)
 
-        # ---- Download ----
         with tempfile.TemporaryDirectory() as td:
+            # ---- Download ----
             local_path = os.path.join(td, filename)
             download_to_path(gcs_uri, local_path)
+            record_content_hash(job_id, local_path)
 
             filetype = detect_type(local_path)
             if filetype == "pdf":
-                text = extract_text_from_pdf(local_path)
+                total = pdf_page_count(local_path)
+                STATUS.update(job_id, pages_total=total, pages_done=0, pages_text_layer=0, pages_ocr=0)
+
+                if total > OCR_FANOUT_PAGES:
+                    ranges = [
+                        (first, min(first + OCR_PAGES_PER_TASK - 1, total))
+                        for first in range(1, total + 1, OCR_PAGES_PER_TASK)
+                    ]
+                    options = lane_options(lane, continuation=True)
+                    chord([
+                        ocr_pages_task.s(job_id, gcs_uri, filename, first, last, total).set(**options)
+                        for first, last in ranges
+                    ])(
+                        collect_pages.s(job_id).set(**options)
+                        | analyze_document.s(job_id).set(**options)
+                        | index_document.s(job_id).set(**options)
+                    )
+                    STATUS.update(job_id, stage=f"OCR split into {len(ranges)} page ranges")
+                    return
+
+                pages = iter_page_range(job_id, local_path, 1, total, total)
             elif filetype == "image":
-                text = extract_text_from_image(local_path)
+                pages = iter_image_frames(job_id, local_path)
             elif filetype == "text":
                 with open(local_path, 'r', encoding='utf-8', errors='ignore') as f:
-                    text = f.read()
+                    pages = [(1, f.read())]
             else:
-                text = ""
-
-        # ---- NLP ----
-        STATUS.update(job_id, status="NLP_IN_PROGRESS", progress=80)
-
-        doc = NLP(text)
-        entities = [{"text": e.text, "label": e.label_} for e in doc.ents]
-        tags = extract_tags(text, entities)
-
-        # ---- Chunk + Embeddings ----
-        chunks = chunk_text(text)
-        points = []
-
-        for idx, chunk in enumerate(chunks):
-            if not chunk.strip():
-                continue
-
-            emb = embed(chunk)
-            point_id = str(uuid.uuid4())
-
-            points.append(
-                PointStruct(
-                    id=point_id,
-                    vector=emb,
-                    payload={
-                        "document_id": job_id,
-                        "chunk_index": idx,
-                        "text": chunk,
-                    }
-                )
-            )
+                pages = []
 
-        if points:
-            qclient.upsert(collection_name=QDRANT_COLLECTION, points=points)
-            print(f"✓ Inserted {len(points)} chunks for {job_id}")
+            # ---- OCR -> chunk -> embed -> upsert, NLP at the end ----
+            ocr_pages = []
 
-        # ---- Update database ----
-        with get_session() as s:
-            d = s.get(Document, job_id)
-            if d:
-                d.status = "COMPLETED"
-                d.text = text[:100000]
-                d.entities_json = json.dumps(entities)
-                d.tags_json = json.dumps(tags)
-                s.commit()
+            def keep(pages):
+                for page in pages:
+                    ocr_pages.append(page)
+                    yield page
 
-        STATUS.update(job_id, status="COMPLETED", progress=100)
+            start = time.perf_counter()
+            point_ids = []
+            with indexing_pipeline(job_id, point_ids) as pipe:
+                feed_chunks(pipe, chunk_pages(keep(pages)))
+                print(f"✓ OCR {len(ocr_pages)} pages for {job_id} in {time.perf_counter() - start:.1f}s")
 
-    except Exception as e:
-        STATUS.update(job_id, status="FAILED", stage=str(e))
-        raise
+                # Runs while the last batches are still being embedded
+                analysis = analyze_document(ocr_pages, job_id)
+                STATUS.update(job_id, status="INDEXING", progress=90, stage="Embedding chunks")
+
+        finish_document(job_id, analysis, point_ids)
+
+
+# ============================================================
+# Maintenance (celery beat, see celeryconfig.beat_schedule)
+# ============================================================
+@celery_app.task(queue=OCR_QUEUE)
+def sweep_tenant_slots():
+    """Frees leaked tenant slots and publishes the waiting jobs they admit."""
+    admitted = LIMITER.sweep()
+    publish_jobs(admitted)
+    if admitted:
+        print(f"✓ Tenant sweep admitted {len(admitted)} waiting jobs")
@@ -0,0 +1,127 @@
+import json
+import os
+import time
+import redis
+
+DEFAULT_TENANT = "default"
+SLOTS_PREFIX = "tenant:slots:"
+WAITING_PREFIX = "tenant:waiting:"
+
+# Jobs a tenant may have processing at once per lane (0 = unlimited).
+# Lanes have separate slots, so a bulk backfill never takes the capacity
+# interactive uploads need. Per-tenant overrides as JSON, either one
+# number for both lanes or per lane, e.g.
+# TENANT_LIMITS='{"archive": {"bulk": 2}, "demo": 1}'
+TENANT_MAX_JOBS = int(os.environ.get("TENANT_MAX_JOBS", "8"))
+TENANT_MAX_BULK_JOBS = int(os.environ.get("TENANT_MAX_BULK_JOBS", "4"))
+LANE_LIMITS = {"interactive": TENANT_MAX_JOBS, "bulk": TENANT_MAX_BULK_JOBS}
+TENANT_LIMITS = json.loads(os.environ.get("TENANT_LIMITS", "{}"))
+# A slot older than this is considered leaked (crashed worker) and freed
+TENANT_SLOT_TTL = int(os.environ.get("TENANT_SLOT_TTL", 2 * 3600))
+
+# Appends jobs to the waiting list, then admits waiting jobs, oldest
+# first, while slots are free (also picks up slots freed by expiry).
+# KEYS: slots zset, waiting list
+# ARGV: now, limit, stale-before, job 1, job 2, ...
+SUBMIT_SCRIPT = """
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[3])
+for i = 4, #ARGV do
+  redis.call('RPUSH', KEYS[2], ARGV[i])
+end
+local limit = tonumber(ARGV[2])
+local admitted = {}
+while limit <= 0 or redis.call('ZCARD', KEYS[1]) < limit do
+  local job = redis.call('LPOP', KEYS[2])
+  if not job then break end
+  redis.call('ZADD', KEYS[1], ARGV[1], cjson.decode(job)['job_id'])
+  admitted[#admitted + 1] = job
+end
+return admitted
+"""
+
+# Frees a job's slot and hands free slots to the oldest waiting jobs.
+# KEYS: slots zset, waiting list
+# ARGV: job id, now, limit, stale-before
+RELEASE_SCRIPT = """
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[4])
+local limit = tonumber(ARGV[3])
+local admitted = {}
+while limit <= 0 or redis.call('ZCARD', KEYS[1]) < limit do
+  local job = redis.call('LPOP', KEYS[2])
+  if not job then break end
+  redis.call('ZADD', KEYS[1], ARGV[2], cjson.decode(job)['job_id'])
+  admitted[#admitted + 1] = job
+end
+return admitted
+"""
+
+
+class TenantLimiter:
+    """
+    Per-tenant, per-lane cap on concurrently processing jobs, applied
+    before jobs reach the broker. Each admitted job holds a slot (member
+    of a sorted set scored by start time) until it completes or fails;
+    jobs over the cap wait in a Redis list and are published as slots
+    free up, so workers never see them early.
+    """
+
+    def __init__(self, url: str | None = None):
+        self.r = redis.Redis.from_url(url or os.environ.get("REDIS_URL"))
+        self._submit = self.r.register_script(SUBMIT_SCRIPT)
+        self._release = self.r.register_script(RELEASE_SCRIPT)
+
+    def limit(self, tenant: str, lane: str) -> int:
+        limit = TENANT_LIMITS.get(tenant, LANE_LIMITS.get(lane, TENANT_MAX_JOBS))
+        if isinstance(limit, dict):
+            limit = limit.get(lane, LANE_LIMITS.get(lane, TENANT_MAX_JOBS))
+        return int(limit)
+
+    def _keys(self, tenant: str, lane: str) -> list[str]:
+        return [f"{SLOTS_PREFIX}{tenant}:{lane}", f"{WAITING_PREFIX}{tenant}:{lane}"]
+
+    def submit(self, tenant: str, lane: str, jobs: list[dict]) -> list[dict]:
+        """
+        Queues jobs (dicts with a job_id) behind any already waiting and
+        returns those admitted now, possibly including earlier ones. The
+        rest come back from a later submit() or release().
+        """
+        if not jobs:
+            return []
+        now = time.time()
+        args = [now, self.limit(tenant, lane), now - TENANT_SLOT_TTL]
+        args += [json.dumps(job) for job in jobs]
+        admitted = self._submit(keys=self._keys(tenant, lane), args=args)
+        return [json.loads(job) for job in admitted]
+
+    def release(self, tenant: str, lane: str, job_id: str) -> list[dict]:
+        """Frees job_id's slot; returns the waiting jobs admitted in its place."""
+        now = time.time()
+        admitted = self._release(
+            keys=self._keys(tenant, lane),
+            args=[job_id, now, self.limit(tenant, lane), now - TENANT_SLOT_TTL],
+        )
+        return [json.loads(job) for job in admitted]
+
+    def sweep(self) -> list[dict]:
+        """
+        Expires leaked slots of every (tenant, lane) that has waiting jobs
+        and returns the jobs admitted in their place. Run periodically:
+        a worker killed mid-job (OOM, SIGKILL) never releases its slot,
+        and nothing else would hand it on if no further jobs arrive.
+        """
+        admitted = []
+        for key in self.r.scan_iter(match=WAITING_PREFIX + "*", count=500):
+            tenant, lane = key.decode()[len(WAITING_PREFIX):].rsplit(":", 1)
+            admitted += self.release(tenant, lane, "")
+        return admitted
+
+    def touch(self, tenant: str, lane: str, job_id: str):
+        """Restarts the slot's leak timer once a worker picks the job up."""
+        self.r.zadd(self._keys(tenant, lane)[0], {job_id: time.time()}, xx=True)
+
+    def running(self, tenant: str, lane: str) -> int:
+        return self.r.zcount(self._keys(tenant, lane)[0], time.time() - TENANT_SLOT_TTL, "+inf")
+
+    def waiting(self, tenant: str, lane: str) -> int:
+        return self.r.llen(self._keys(tenant, lane)[1])
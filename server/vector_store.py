@@ -1,94 +1,249 @@
-# vector_store.py (renamed from qdrant_client.py to avoid naming conflict)
+# vector_store.py: the one place that talks to Qdrant (API and worker)
 import os
-from typing import List
-from server.vector_store import QdrantClient
-from qdrant_client.http import models as qmodels
+import threading
+import uuid
+
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    PointStruct,
+    Distance,
+    VectorParams,
+    Filter,
+    FieldCondition,
+    MatchValue,
+    MatchAny,
+    Range,
+    HasIdCondition,
+    PayloadSchemaType,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+)
+
+from embeddings import EMBEDDING_DIM
 
 QDRANT_URL = os.environ.get("QDRANT_URL", "http://qdrant:6333")
-COLLECTION_NAME = os.environ.get("QDRANT_COLLECTION", "document_chunks")
-DIM = 1536  # OpenAI text-embedding-3-small
+QDRANT_COLLECTION = os.environ.get("QDRANT_COLLECTION", "ocr_documents")
+# gRPC is faster for large upserts/searches; REST stays the default
+QDRANT_PREFER_GRPC = os.environ.get("QDRANT_PREFER_GRPC", "0") == "1"
+QDRANT_GRPC_PORT = int(os.environ.get("QDRANT_GRPC_PORT", "6334"))
+QDRANT_TIMEOUT = int(os.environ.get("QDRANT_TIMEOUT", "30"))
+# Points per upsert request
+QDRANT_UPSERT_BATCH = int(os.environ.get("QDRANT_UPSERT_BATCH", "256"))
+
+# Large-corpus options, applied when the collection is created:
+# QDRANT_QUANTIZATION = none | scalar (int8, ~4x smaller) | binary (~32x)
+QDRANT_QUANTIZATION = os.environ.get("QDRANT_QUANTIZATION", "none")
+QDRANT_ON_DISK = os.environ.get("QDRANT_ON_DISK", "0") == "1"
+
+# Payload fields used in filters get an index so filtering doesn't scan
+PAYLOAD_INDEXES = {
+    "document_id": PayloadSchemaType.KEYWORD,
+    "tags": PayloadSchemaType.KEYWORD,
+    "created_at": PayloadSchemaType.INTEGER,
+}
+
+# Namespace for deterministic chunk point ids
+POINT_NAMESPACE = uuid.UUID("6f1c2a4e-8d3b-5e7f-9a0c-1b2d3e4f5a6b")
+
+_client = None
+_lock = threading.Lock()
+
 
 # ---------------------------------------------------------
-# CREATE CLIENT
+# CLIENT
 # ---------------------------------------------------------
-client = QdrantClient(url=QDRANT_URL)
+def client() -> QdrantClient:
+    """
+    Returns the process-wide Qdrant client, created on first use so that
+    forked Celery/gunicorn workers each open their own connections.
+    The collection is bootstrapped once per process.
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                c = QdrantClient(
+                    url=QDRANT_URL,
+                    prefer_grpc=QDRANT_PREFER_GRPC,
+                    grpc_port=QDRANT_GRPC_PORT,
+                    timeout=QDRANT_TIMEOUT,
+                )
+                ensure_collection(c)
+                _client = c
+    return _client
+
 
 # ---------------------------------------------------------
 # CREATE COLLECTION IF NOT EXISTS
 # ---------------------------------------------------------
-def ensure_qdrant_collection():
+def quantization_config():
+    if QDRANT_QUANTIZATION == "scalar":
+        return ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if QDRANT_QUANTIZATION == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def ensure_collection(c: QdrantClient):
     try:
-        collections = qclient.get_collections().collections
-        collection_names = [col.name for col in collections]
-        
-        if QDRANT_COLLECTION_NAME not in collection_names:
-            qclient.create_collection(
-                collection_name=QDRANT_COLLECTION_NAME,
-                vectors_config=VectorParams(size=384, distance=Distance.COSINE),
-            )
-            print(f"Created Qdrant collection: {QDRANT_COLLECTION_NAME}")
+        collections = c.get_collections().collections
+        if any(col.name == QDRANT_COLLECTION for col in collections):
+            print(f"✓ Qdrant collection '{QDRANT_COLLECTION}' already exists")
         else:
-            print(f"Qdrant collection already exists: {QDRANT_COLLECTION_NAME}")
+            print(f"Creating Qdrant collection '{QDRANT_COLLECTION}'...")
+            c.create_collection(
+                collection_name=QDRANT_COLLECTION,
+                vectors_config=VectorParams(
+                    size=EMBEDDING_DIM, distance=Distance.COSINE, on_disk=QDRANT_ON_DISK
+                ),
+                quantization_config=quantization_config(),
+                on_disk_payload=QDRANT_ON_DISK,
+            )
+            print(f"✓ Created Qdrant collection '{QDRANT_COLLECTION}'")
+
     except Exception as e:
         # If collection already exists (race condition), ignore
         if "already exists" in str(e):
-            print(f"Collection {QDRANT_COLLECTION_NAME} already exists (concurrent creation)")
+            print(f"✓ Collection '{QDRANT_COLLECTION}' already exists")
         else:
             raise
 
+    # Idempotent; also upgrades collections created before the indexes
+    for field, schema in PAYLOAD_INDEXES.items():
+        c.create_payload_index(
+            collection_name=QDRANT_COLLECTION, field_name=field, field_schema=schema
+        )
+
+
 # ---------------------------------------------------------
-# INSERT CHUNKS
+# WRITE
 # ---------------------------------------------------------
-def upsert_chunks(doc_id: str, chunks: List[str], embeddings: List[List[float]]):
+def chunk_point_id(document_id: str, chunk_index: int) -> str:
+    """Same document + chunk always maps to the same point, so reprocessing overwrites."""
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{document_id}:{chunk_index}"))
+
+
+def document_filter(document_id: str) -> Filter:
+    return Filter(must=[FieldCondition(key="document_id", match=MatchValue(value=document_id))])
+
+
+def upsert_points(points: list[PointStruct]):
+    """Upserts in pages of QDRANT_UPSERT_BATCH to bound request size."""
+    for i in range(0, len(points), QDRANT_UPSERT_BATCH):
+        client().upsert(
+            collection_name=QDRANT_COLLECTION,
+            points=points[i:i + QDRANT_UPSERT_BATCH],
+        )
+
+
+def upsert_chunks(document_id: str, payloads: list[dict], vectors: list[list[float]]) -> list[str]:
     """
-    Upserts text chunks into Qdrant under a single document_id.
-    Each chunk is one vector record with:
-      - id: unique integer
-      - payload.document_id
-      - payload.chunk_index
-      - payload.text
-      - vector: embedding
+    Upserts one point per chunk. Each payload must carry chunk_index;
+    document_id is added. Returns the point ids written.
     """
-    ensure_collection()
-    points = []
-    for idx, (text, emb) in enumerate(zip(chunks, embeddings)):
-        points.append(
-            qmodels.PointStruct(
-                id=f"{doc_id}-{idx}",
-                vector=emb,
-                payload={
-                    "document_id": doc_id,
-                    "chunk_index": idx,
-                    "text": text,
-                },
-            )
+    points = [
+        PointStruct(
+            id=chunk_point_id(document_id, payload["chunk_index"]),
+            vector=vector,
+            payload={**payload, "document_id": document_id},
         )
-    client.upsert(
-        collection_name=COLLECTION_NAME,
-        points=points,
+        for payload, vector in zip(payloads, vectors)
+    ]
+    upsert_points(points)
+    return [p.id for p in points]
+
+
+def delete_document(document_id: str, keep_ids: list[str] | None = None):
+    """
+    Deletes a document's points, except keep_ids. After reprocessing,
+    pass the ids just written to drop only stale chunks.
+    """
+    selector = Filter(
+        must=document_filter(document_id).must,
+        must_not=[HasIdCondition(has_id=keep_ids)] if keep_ids else None,
     )
-    print(f"[QDRANT] Inserted {len(points)} chunks for document {doc_id}")
+    client().delete(collection_name=QDRANT_COLLECTION, points_selector=selector)
 
-# ---------------------------------------------------------
-# SEMANTIC SEARCH
-# ---------------------------------------------------------
-def semantic_search(doc_id: str, query_emb: List[float], limit: int = 5) -> List[str]:
+
+def set_document_payload(document_id: str, **payload):
+    """Sets payload keys on every point of a document (e.g. tags after NLP)."""
+    client().set_payload(
+        collection_name=QDRANT_COLLECTION,
+        payload=payload,
+        points=document_filter(document_id),
+    )
+
+
+def copy_document(src_id: str, dst_id: str, **payload_overrides) -> int:
     """
-    Searches inside a single document using semantic vector search.
-    Returns the chunk text pieces.
+    Copies every chunk vector of one document to another document id.
+    Used when an upload is a byte-identical duplicate of a processed file.
     """
-    ensure_collection()
-    hits = client.search(
-        collection_name=COLLECTION_NAME,
-        query_vector=query_emb,
-        limit=limit,
-        filter=qmodels.Filter(
-            must=[
-                qmodels.FieldCondition(
-                    key="document_id",
-                    match=qmodels.MatchValue(value=doc_id),
+    copied = 0
+    offset = None
+    while True:
+        records, offset = client().scroll(
+            collection_name=QDRANT_COLLECTION,
+            scroll_filter=document_filter(src_id),
+            limit=QDRANT_UPSERT_BATCH,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True,
+        )
+        if records:
+            upsert_points([
+                PointStruct(
+                    id=chunk_point_id(dst_id, r.payload["chunk_index"]),
+                    vector=r.vector,
+                    payload={**r.payload, **payload_overrides, "document_id": dst_id},
                 )
-            ]
-        ),
+                for r in records
+            ])
+            copied += len(records)
+        if offset is None:
+            return copied
+
+
+# ---------------------------------------------------------
+# SEARCH
+# ---------------------------------------------------------
+def corpus_filter(tags: list[str] | None = None, created_from: int | None = None,
+                  created_to: int | None = None) -> Filter | None:
+    """Filter on chunk tags (any match) and upload time (epoch seconds)."""
+    conditions = []
+    if tags:
+        conditions.append(FieldCondition(key="tags", match=MatchAny(any=tags)))
+    if created_from is not None or created_to is not None:
+        conditions.append(FieldCondition(
+            key="created_at", range=Range(gte=created_from, lte=created_to)
+        ))
+    return Filter(must=conditions) if conditions else None
+
+
+def search(query_vector: list[float], document_id: str | None = None, limit: int = 5):
+    """Top chunks for a query, optionally inside a single document."""
+    return client().search(
+        collection_name=QDRANT_COLLECTION,
+        query_vector=query_vector,
+        limit=limit,
+        query_filter=document_filter(document_id) if document_id else None,
     )
-    return [hit.payload.get("text", "") for hit in hits]
\ No newline at end of file
+
+
+def search_documents(query_vector: list[float], limit: int, per_document: int,
+                     query_filter: Filter | None = None):
+    """Top documents for a query, each with its best `per_document` chunks."""
+    return client().search_groups(
+        collection_name=QDRANT_COLLECTION,
+        query_vector=query_vector,
+        group_by="document_id",
+        limit=limit,
+        group_size=per_document,
+        query_filter=query_filter,
+        with_payload=["text", "chunk_index", "page"],
+    ).groups